@@ -57,6 +57,13 @@ def _status_alive():
     return "alive"
 
 
+@application.route("/status/cache")
+def _status_cache():
+    from modules.cache import get_cache_stats
+    from modules.response import helper
+    return helper.response_ok(get_cache_stats())
+
+
 env = os.environ.get('ENV')
 
 for blueprint in blueprints:
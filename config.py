@@ -30,6 +30,36 @@ class IPFSConfig:
     node_address = '127.0.0.1'
     port = 5001
 
+    # pending IPFS objects are tracked in batches (see works/track_ipfs_files.py)
+    track_period = 60
+    track_batch_size = 20
+    track_max_batches = 10
+    track_timeout = '30s'
+
+    # the contracts whose meta files are not translated yet are translated after tracking, the newest first
+    translate_batch_size = 40
+
+    # the directories are crawled breadth-first up to the depth and the number of objects (see modules/ipfs.py)
+    crawl_concurrency = 8
+    crawl_max_depth = 16
+    crawl_max_objects = 5000
+
+    # IPFS objects are content-addressed, so the listed links of a hash are cached for a long time
+    links_cache_timeout = 30 * 24 * 60 * 60
+
+    # the meta files are read from the node first, and from the gateways if the node doesn't have them. Multiple
+    # gateways can be set by IPFS_GATEWAYS (comma separated).
+    meta_timeout = '5s'
+    gateways = [url.strip() for url in os.environ.get('IPFS_GATEWAYS', '').split(',') if url.strip()] or [
+        'https://ipfs.io',
+        'https://cloudflare-ipfs.com',
+        'https://gateway.pinata.cloud',
+    ]
+    gateway_timeout = 10
+
+    # a meta file not found is not looked up again for a while, since it waits for the timeouts of all gateways
+    meta_missing_timeout = 10 * 60
+
 
 class Web3ProviderConfig:
     """
@@ -40,8 +70,45 @@ class Web3ProviderConfig:
         'stage': 'https://ropsten.infura.io/' + os.environ.get('INFURA_API_KEY', '')
     }.get(os.environ.get('ENV', 'dev'), 'http://localhost:8545')
 
+    # multiple endpoints can be set by WEB3_ENDPOINT_URLS (comma separated). The requests are sent to the fastest
+    # endpoint, and failed over to the others (see modules/endpoint_pool.py).
+    endpoint_urls = [url.strip() for url in os.environ.get('WEB3_ENDPOINT_URLS', '').split(',') if url.strip()] \
+        or [endpoint_url]
+
+    # websocket endpoint for subscribing new blocks and logs (see works/listen_chain.py)
+    websocket_url = {
+        'production': 'wss://mainnet.infura.io/ws',
+        'stage': 'wss://ropsten.infura.io/ws'
+    }.get(os.environ.get('ENV', 'dev'), 'ws://localhost:8546')
+
     timeout = 5
 
+    # a read request is sent to the next endpoint too if not responded in max(hedge_delay, latency * factor) seconds
+    hedge_delay = 0.3
+    hedge_latency_factor = 2
+
+    # latency is tracked by exponentially weighted moving average
+    latency_decay = 0.2
+
+    # an endpoint is ejected for ejection_time seconds if failed failure_threshold times in a row. The ejection time is
+    # doubled on every ejection in a row up to max_ejection_time.
+    failure_threshold = 3
+    ejection_time = 10
+    max_ejection_time = 5 * 60
+
+    # HTTP connections kept alive to the endpoint. pool_maxsize should not be less than the number of threads.
+    pool_connections = 1
+    pool_maxsize = 20
+
+    # the maximum number of calls in a JSON-RPC batch request (see modules/chain.py). Set 1 if not supported.
+    batch_size = 100
+
+    # the number of threads for calling the endpoint concurrently (see modules/chain.py)
+    max_workers = 8
+
+    # receipts of the mined transactions never change, so they are cached
+    receipt_cache_timeout = 24 * 60 * 60
+
 
 class MuzikaContractConfig:
     """
@@ -53,6 +120,101 @@ class MuzikaContractConfig:
     # @TODO Set long period on test/main network
     update_period = 10
 
+    # if the chain listener runs (works/listen_chain.py), the tasks are triggered by new blocks and only polled
+    # with the fallback period to handle the missed blocks and the expired contracts
+    listener_enabled = os.environ.get('CHAIN_LISTENER', '') in ['1', 'true']
+    fallback_update_period = 5 * 60
+
+    # the listener reconnects if no block comes in the idle timeout, with backoff from reconnect_delay
+    # to max_reconnect_delay. If it was disconnected too long, only the last listener_max_catch_up blocks are checked.
+    listener_idle_timeout = 120
+    listener_reconnect_delay = 1
+    listener_max_reconnect_delay = 60
+    listener_max_catch_up = 100
+
+    # the blocks that have less confirmations than this can be reorganized, so they are not indexed yet
+    confirmations = 12
+
+    # payments are confirmed by scanning event logs (see works/index_payments.py). If no checkpoint, the indexer
+    # starts from `index_initial_blocks` before the latest block.
+    log_block_range = 2000
+    index_initial_blocks = 2000
+    index_max_ranges = 10
+
+    # the payments created less than this (seconds) ago cannot be in the confirmed blocks yet (about 15 seconds per
+    # block), so update_payments doesn't query their receipts
+    payment_check_delay = confirmations * 15
+
+    # prepared contract instances are cached per (contract name, address) for each web3 instance (see
+    # modules/muzika_contract.py)
+    contract_cache_size = 1024
+
+    # read-only calls to many paper contracts are packed into an aggregate call of the multicall contract
+    # (see modules/contracts/paper_contract.py). If not deployed, the calls are sent in a JSON-RPC batch request.
+    multicall_address = os.environ.get('MULTICALL_ADDRESS')
+    multicall_size = 100
+
+
+class CeleryConfig:
+    """
+    Global constants for celery queues (see tasks.py)
+
+    Each queue is consumed by its own worker, so slow IPFS requests cannot starve the chain tasks. The worker takes
+    the concurrency and the prefetch multiplier of its queue (see scripts/celery_worker.py), and the tasks in the queue
+    take the time limits (seconds).
+
+    > python scripts/celery_worker.py ipfs --loglevel=INFO
+
+    In local environment, a single worker can consume all queues.
+
+    > celery worker -A tasks -B -Q ipfs,chain,maintenance
+    """
+    queues = {
+        # IPFS requests wait for the network for a long time, but use little CPU
+        'ipfs': {
+            'concurrency': 4,
+            'prefetch_multiplier': 1,
+            'soft_time_limit': 5 * 60,
+            'time_limit': 6 * 60,
+        },
+        'chain': {
+            'concurrency': 2,
+            'prefetch_multiplier': 1,
+            'soft_time_limit': 2 * 60,
+            'time_limit': 3 * 60,
+        },
+        # DB maintenance and the tasks without routes (default queue)
+        'maintenance': {
+            'concurrency': 1,
+            'prefetch_multiplier': 4,
+            'soft_time_limit': 10 * 60,
+            'time_limit': 11 * 60,
+        },
+    }
+
+    routes = {
+        'tasks.update_contract_files': 'ipfs',
+        'tasks.track_ipfs_files': 'ipfs',
+        'tasks.update_contracts': 'chain',
+        'tasks.update_payments': 'chain',
+        'tasks.index_payments': 'chain',
+        'tasks.prune_sign_messages': 'maintenance',
+    }
+
+
+class TaskScheduleConfig:
+    """
+    Global constants for running periodic tasks (see modules/task_schedule.py)
+    """
+    # a task is skipped while the same task is running. The lock expires after lock_timeout if the worker died, so
+    # it should be longer than the time limits of the tasks (CeleryConfig.queues).
+    lock_timeout = 12 * 60
+
+    # if a task has nothing to do, the interval to the next run is multiplied by backoff_factor up to max_interval
+    min_interval = MuzikaContractConfig.update_period
+    max_interval = 5 * 60
+    backoff_factor = 2
+
 
 class SignMessageConfig:
     """
@@ -60,6 +222,49 @@ class SignMessageConfig:
     """
     unsigned_message_expired_time = 300  # 5 minute
     signed_message_expired_time = 24 * 60 * 60  # 1 day
+    jwt_expired_time = 30 * 24 * 60 * 60  # 30 days
+
+    # sign messages that cannot be used for authentication anymore are deleted periodically in small batches
+    prune_period = 60 * 60  # 1 hour
+    prune_batch_size = 1000
+    prune_max_batches = 100
+
+
+class SignatureConfig:
+    """
+    Global constants for signature validation
+    """
+    # backend for recovering ethereum address from signature. 'auto' uses libsecp256k1 if coincurve is installed.
+    recovery_backend = os.environ.get('SIGNATURE_RECOVERY_BACKEND', 'auto')
+
+    # backend for verifying ontology signatures. 'auto' uses OpenSSL if cryptography is installed.
+    ont_verify_backend = os.environ.get('ONT_VERIFY_BACKEND', 'auto')
+
+    # the number of ontology verifying keys cached by public key
+    ont_key_cache_size = 1024
+
+
+class RateLimitConfig:
+    """
+    Global constants for rate limiting (see modules/rate_limit.py)
+    """
+    enabled = True
+
+    # the number of proxies (ex. ELB) in front of the server that append the client address to X-Forwarded-For
+    trusted_proxies = 1 if os.environ.get('ENV') in ['production', 'stage'] else 0
+
+    # (rate (tokens per second), capacity) of the token buckets for each limit and key. The address is limited per
+    # client IP, so nobody can lock the others out by draining the bucket of their address.
+    limits = {
+        'login': {
+            'ip': (1, 30),
+            'address+ip': (10 / 60, 10),
+        },
+        'sign-message': {
+            'ip': (1, 60),
+            'address+ip': (10 / 60, 10),
+        },
+    }
 
 
 class CacheConfig:
@@ -70,3 +275,16 @@ class CacheConfig:
     host = 'localhost'
     port = 6379  # ignored if local cache
     key_prefix = 'muzika-redis-cache'
+
+    # user profiles looked up by address (see modules/user.py). Unknown addresses are cached for a short time.
+    user_profile_timeout = 5 * 60
+    user_not_found_timeout = 30
+
+    # verified JWT sessions (see modules/login.py). The timeout is also bounded by the token expiration.
+    session_timeout = 60 * 60
+
+    # purchases never be cancelled, so the purchased results from the contracts are cached for a long time
+    purchased_timeout = 7 * 24 * 60 * 60
+
+    # collect hits, misses, sets, evictions, value sizes and latency per key namespace (see modules/cache.py)
+    metrics_enabled = True
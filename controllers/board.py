@@ -8,6 +8,7 @@ from modules.board import MUSIC_POST_TYPE
 from modules.login import jwt_check
 from modules.response.error import ERR
 from modules.response import helper
+from modules.task_schedule import wake_task
 from modules.youtube import parse_youtube_id
 
 blueprint = Blueprint('board', __name__, url_prefix='/api')
@@ -143,9 +144,13 @@ def _post_to_community(board_type):
                 post_id=post_id
             )
 
-            contract_id = contract_statement.insert(connection).lastrowid
-            # update IPFS file info later
-            tasks.update_contract_files.delay(ipfs_file_id, contract_id)
+            contract_statement.insert(connection)
+
+            # track IPFS files with the other pending files and translate the contract later
+            tasks.track_ipfs_files.delay()
+
+            # check the new contract soon even if the task is backed off
+            wake_task('update_contracts')
 
         # if tags exist, insert tags
         if tags:
@@ -3,11 +3,12 @@ from flask import Blueprint, request
 from sqlalchemy import text
 
 from modules import database as db
-from modules.contracts.paper_contract import MuzikaPaperContract
+from modules.account_address import to_checksum_address
 from modules.login import jwt_check
+from modules.purchase import is_purchased
+from modules.task_schedule import wake_task
 from modules.response.error import ERR
 from modules.response import helper
-from modules.web3 import get_web3
 from modules.utils import txhash_validation
 
 blueprint = Blueprint('music_contract', __name__, url_prefix='/api')
@@ -39,13 +40,10 @@ def _get_paper_file(contract_address):
 
     user_address = request.user['address']
 
-    web3 = get_web3()
-    contract_address = web3.toChecksumAddress(contract_address)
-    contract = MuzikaPaperContract(web3, contract_address=contract_address)
-
-    if not contract.purchased(user_address, {'from': user_address}):
-        # if the user hasn't purchased this paper
-        return helper.response_err(ERR.COMMON.AUTHENTICATION_FAILED)
+    try:
+        contract_address = to_checksum_address(contract_address)
+    except ValueError:
+        return helper.response_err(ERR.COMMON.INVALID_REQUEST_BODY)
 
     key_query_statement = """
         SELECT 
@@ -60,6 +58,11 @@ def _get_paper_file(contract_address):
         LIMIT 1
     """
 
+    # the purchase may be checked by calling the contract, so it is checked without holding a database connection
+    if not is_purchased(contract_address, user_address):
+        # if the user hasn't purchased this paper
+        return helper.response_err(ERR.COMMON.AUTHENTICATION_FAILED)
+
     with db.engine_rdonly.connect() as connection:
         key_query = connection.execute(text(key_query_statement),
                                        contract_address=contract_address,
@@ -107,4 +110,7 @@ def _post_music_purchase():
             requester=requester
         ).insert(connection).lastrowid
 
+    # check the new payment soon even if the task is backed off
+    wake_task('update_payments')
+
     return helper.response_ok({'payment_id': payment_id, 'tx_hash': tx_hash})
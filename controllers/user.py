@@ -6,19 +6,17 @@ from sqlalchemy.exc import IntegrityError
 
 from modules import database as db
 from modules.account_address import check_address_format, check_eth_address_format, check_ont_address_format
-from modules.login import jwt_check, PLATFORM_TYPES
+from modules.login import jwt_check, expire_sessions, PLATFORM_TYPES
+from modules.rate_limit import rate_limit, by_client_ip, by_json_field, by_keys, by_view_arg
 from modules.response.error import ERR
 from modules.response import helper
-from modules.secret import load_secret_json
 from modules.sign_message import get_message_for_user
-from modules.web3 import get_web3
+from modules.user import get_user_profile, expire_user_profile
+from modules.utils import eth_address_validation
 
 blueprint = Blueprint('user', __name__, url_prefix='/api')
 
 
-s3_policy = load_secret_json('aws')['s3']
-
-
 @blueprint.route('/me', methods=['GET'])
 @jwt_check
 def _get_me():
@@ -33,38 +31,21 @@ def _get_user(address):
     If user(address) does not exist, give a random message for signing
     """
 
-    s3_base_url = 'https://s3.{region}.amazonaws.com'.format(region=s3_policy['profile']['region'])
-
-    user_query_stmt = """
-        SELECT `u`.*, CONCAT(:s3_base_url, '/', `f`.`bucket`, '/', `f`.`object_key`) AS `profile_image` FROM `{}` `u`
-        LEFT JOIN `{}` `f`
-          ON (`f`.`file_id` = `u`.`profile_file_id` AND `f`.`type` = :file_type)
-        WHERE `u`.`address` = :address
-        LIMIT 1
-    """.format(db.table.USERS, db.table.FILES)
-
     # if invalid address format, don't generate message
-    if not check_address_format(address):
+    if not eth_address_validation(address):
         return helper.response_err(ERR.COMMON.INVALID_REQUEST_BODY)
 
-    web3 = get_web3()
-    web3.toChecksumAddress(address)
-
     with db.engine_rdonly.connect() as connection:
-        user = connection.execute(
-            text(user_query_stmt),
-            s3_base_url=s3_base_url,
-            address=address,
-            file_type='profile'
-        ).fetchone()
+        user = get_user_profile(connection, address)
 
         if user is None:
             return helper.response_err(ERR.COMMON.NOT_EXIST)
 
-        return helper.response_ok(db.to_relation_model(user))
+        return helper.response_ok(user)
 
 
 @blueprint.route('/user/<address>/sign-message', methods=['GET'])
+@rate_limit('sign-message', by_client_ip, by_keys(by_view_arg('address'), by_client_ip))
 def _get_user_sign_message(address):
     """
     Returns an user information by wallet address.
@@ -80,6 +61,7 @@ def _get_user_sign_message(address):
 
 
 @blueprint.route('/user/eth/<address>/sign-message', methods=['GET'])
+@rate_limit('sign-message', by_client_ip, by_keys(by_view_arg('address'), by_client_ip))
 def _get_user_eth_sign_message(address):
     """
     Returns an user information by ethereum wallet address.
@@ -95,6 +77,7 @@ def _get_user_eth_sign_message(address):
 
 
 @blueprint.route('/user/ont/<address>/sign-message', methods=['GET'])
+@rate_limit('sign-message', by_client_ip, by_keys(by_view_arg('address'), by_client_ip))
 def _get_user_ont_sign_message(address):
     """
         Returns an user information by ontology account address.
@@ -111,6 +94,7 @@ def _get_user_ont_sign_message(address):
 
 @blueprint.route('/register', methods=['POST'])
 @blueprint.route('/login', methods=['POST'])
+@rate_limit('login', by_client_ip, by_keys(by_json_field('address'), by_client_ip))
 def _login():
     from modules.login import generate_jwt_token
 
@@ -125,12 +109,11 @@ def _login():
     if platform_type not in PLATFORM_TYPES:
         return helper.response_err(ERR.COMMON.INVALID_REQUEST_BODY)
 
-    web3 = get_web3()
-
     with db.engine_rdwr.connect() as connection:
+        # signing in doesn't access block chain, so no web3 instance is needed
         jwt_token = generate_jwt_token(
             connection,
-            web3, address, signature,
+            None, address, signature,
             platform_type=platform_type,
             signature_version=signature_version,
             default_user_name=user_name,
@@ -143,6 +126,12 @@ def _login():
             return helper.response_err(ERR.COMMON.AUTHENTICATION_FAILED)
 
 
+def _expire_user_cache(address):
+    # the user information is cached in both user profile and sessions
+    expire_user_profile(address)
+    expire_sessions(address)
+
+
 def _change_user_info(column_name, max_len, min_len=0):
     json_form = request.get_json(force=True, silent=True)
     user_id = request.user['user_id']
@@ -156,6 +145,7 @@ def _change_user_info(column_name, max_len, min_len=0):
             db.statement(db.table.USERS).set(**{column_name:value}).where(user_id=user_id).update(connection)
         except IntegrityError:
             return helper.response_err(ERR.COMMON.ALREADY_EXIST)
+        _expire_user_cache(request.user['address'])
         return helper.response_ok({'status': 'success'})
 
 
@@ -188,6 +178,7 @@ def _put_user_info():
             db.statement(db.table.USERS).set(**change_value).where(user_id=user_id).update(connection)
         except IntegrityError:
             return helper.response_err(ERR.COMMON.ALREADY_EXIST)
+        _expire_user_cache(request.user['address'])
         return helper.response_ok({'status': 'success'})
 
 
@@ -233,6 +224,7 @@ def _change_user_profile():
 
     with db.engine_rdwr.connect() as connection:
         db.statement(db.table.USERS).set(profile_file_id=profile_file_id).where(user_id=user_id).update(connection)
+    _expire_user_cache(request.user['address'])
 
     return helper.response_ok({'status': 'success'})
 
@@ -1,4 +1,12 @@
+from functools import lru_cache
+
+from eth_utils import to_checksum_address as _to_checksum_address
+
 from modules.response.helper import deprecated
+from modules.utils import eth_address_validation
+
+# the number of addresses memoized for checksum
+CHECKSUM_CACHE_SIZE = 4096
 
 
 @deprecated
@@ -51,3 +59,43 @@ def check_ont_address_format(address):
             return False
 
     return True
+
+
+@lru_cache(maxsize=CHECKSUM_CACHE_SIZE)
+def to_checksum_address(address):
+    """
+    Returns the checksum address (EIP-55) of the ethereum address. It only computes keccak hash, so doesn't need any
+    web3 provider.
+    :param address: ethereum account address (hex string)
+    :return: checksum address. If invalid address, raise ValueError.
+    """
+    if not eth_address_validation(address):
+        raise ValueError('Invalid ethereum address format')
+    return _to_checksum_address(address)
+
+
+def check_eth_checksum_address(address):
+    """
+    Checks the address is ethereum account address and its checksum is valid. Since the address that all characters
+    are lower or upper case has no checksum, it is valid if the format is valid.
+    :param address: account address to check.
+    :return: True if valid address or false.
+    """
+    if not eth_address_validation(address):
+        return False
+
+    hex_part = address[2:]
+    if hex_part.islower() or hex_part.isupper() or hex_part.isdigit():
+        return True
+
+    return to_checksum_address(address) == address
+
+
+def normalize_address(address):
+    """
+    Returns the normalized address for comparing or using as a key. Ethereum addresses are case-insensitive (checksum
+    is only expressed by the case), but ontology addresses (base58) are case-sensitive.
+    :param address: ethereum or ontology account address.
+    :return: normalized address.
+    """
+    return address.lower() if address[:2] == '0x' else address
@@ -1,4 +1,9 @@
 
+import pickle
+import re
+import threading
+import time
+
 import redis
 from werkzeug.contrib.cache import RedisCache, SimpleCache
 from config import CacheConfig
@@ -9,6 +14,214 @@ _connection_pool = None
 # cache instance. This is shared by all instances of MuzikaCache
 _cache = None
 
+# key namespaces whose variable parts are grouped in the metrics. A variable part is written like "<name>".
+_namespaces = []
+
+
+def register_namespace(template):
+    """
+    Registers a key namespace for the cache metrics. The keys matched with the template are counted together.
+
+    >>> register_namespace('/db/<protocol>/sign-message/<address>')
+    """
+    pattern = '[^/]+'.join(re.escape(part) for part in re.split(r'<\w+>', template))
+    _namespaces.append((re.compile('^{}$'.format(pattern)), template))
+
+
+def get_namespace(key):
+    """
+    Returns the namespace of the key. If the key is not matched with any registered namespaces, the key without the
+    last path part is used as a namespace.
+    """
+    for pattern, template in _namespaces:
+        if pattern.match(key):
+            return template
+
+    prefix, sep, _ = key.rpartition('/')
+    return (prefix + sep + '*') if sep else key
+
+
+register_namespace('/price/eth')
+register_namespace('/db/<protocol>/sign-message/<address>')
+register_namespace('/db/sign-message/<address>')
+register_namespace('/db/user/<address>')
+register_namespace('/db/session/<jti>')
+register_namespace('/db/session-version/<address>')
+register_namespace('/chain/receipt/<tx_hash>')
+register_namespace('/chain/purchased/<contract_address>/<buyer_address>')
+register_namespace('/ipfs/links/<ipfs_hash>')
+register_namespace('/ipfs/meta/<ipfs_hash>')
+register_namespace('/ipfs/meta-missing/<ipfs_hash>')
+
+
+class CacheMetrics:
+    """
+    Collects hits, misses, sets, deletes, evictions, value sizes and backend latency of the cache grouped by key
+    namespace. The metrics are collected per process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    @staticmethod
+    def _new_stats():
+        return {
+            'hits': 0,
+            'misses': 0,
+            'sets': 0,
+            'deletes': 0,
+            'evictions': 0,
+            'value_bytes': 0,
+            'max_value_bytes': 0,
+            'get_latency': 0.0,
+            'max_get_latency': 0.0,
+            'set_latency': 0.0,
+            'max_set_latency': 0.0,
+        }
+
+    def _get_stats(self, namespace):
+        stats = self._stats.get(namespace)
+        if stats is None:
+            stats = self._stats[namespace] = self._new_stats()
+        return stats
+
+    def record_get(self, key, hit, latency):
+        with self._lock:
+            stats = self._get_stats(get_namespace(key))
+            stats['hits' if hit else 'misses'] += 1
+            stats['get_latency'] += latency
+            stats['max_get_latency'] = max(stats['max_get_latency'], latency)
+
+    def record_set(self, key, value_size, latency):
+        with self._lock:
+            stats = self._get_stats(get_namespace(key))
+            stats['sets'] += 1
+            stats['value_bytes'] += value_size
+            stats['max_value_bytes'] = max(stats['max_value_bytes'], value_size)
+            stats['set_latency'] += latency
+            stats['max_set_latency'] = max(stats['max_set_latency'], latency)
+
+    def record_delete(self, key):
+        with self._lock:
+            self._get_stats(get_namespace(key))['deletes'] += 1
+
+    def record_evictions(self, keys):
+        with self._lock:
+            for key in keys:
+                self._get_stats(get_namespace(key))['evictions'] += 1
+
+    def snapshot(self):
+        """
+        Returns the collected metrics with the average values.
+
+        {
+          "/price/eth": {
+            "hits": ..,
+            "misses": ..,
+            "hit_ratio": ..,
+            "avg_value_bytes": ..,
+            "avg_get_latency": ..,
+            ...
+          },
+          ...
+        }
+        """
+        with self._lock:
+            result = {}
+            for namespace, stats in self._stats.items():
+                stats = dict(stats)
+                gets = stats['hits'] + stats['misses']
+                stats['hit_ratio'] = stats['hits'] / gets if gets else None
+                stats['avg_get_latency'] = stats['get_latency'] / gets if gets else None
+                stats['avg_set_latency'] = stats['set_latency'] / stats['sets'] if stats['sets'] else None
+                stats['avg_value_bytes'] = stats['value_bytes'] / stats['sets'] if stats['sets'] else None
+                result[namespace] = stats
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+
+# metrics instance. This is shared by all instances of MuzikaCache
+cache_metrics = CacheMetrics()
+
+
+class InstrumentedCache:
+    """
+    Wraps a werkzeug cache and records the cache operations to the metrics.
+
+    Only the local cache can report which keys are evicted. Redis evicts keys by itself (maxmemory-policy), so the
+    number of evicted keys for redis is reported by `get_cache_stats` from the redis server info.
+    """
+
+    def __init__(self, cache, metrics=None):
+        self.cache = cache
+        self.metrics = metrics or cache_metrics
+
+    def get(self, key):
+        start = time.perf_counter()
+        value = self.cache.get(key)
+        self.metrics.record_get(key, value is not None, time.perf_counter() - start)
+        return value
+
+    def get_many(self, *keys):
+        start = time.perf_counter()
+        values = self.cache.get_many(*keys)
+        latency = (time.perf_counter() - start) / max(len(keys), 1)
+        for key, value in zip(keys, values):
+            self.metrics.record_get(key, value is not None, latency)
+        return values
+
+    def set(self, key, value, timeout=None):
+        return self._store(self.cache.set, key, value, timeout)
+
+    def add(self, key, value, timeout=None):
+        return self._store(self.cache.add, key, value, timeout)
+
+    def delete(self, key):
+        self.metrics.record_delete(key)
+        return self.cache.delete(key)
+
+    def _store(self, func, key, value, timeout):
+        # SimpleCache prunes the entries only if it has more entries than its threshold.
+        local_keys = None
+        if isinstance(self.cache, SimpleCache) and len(self.cache._cache) > self.cache._threshold:
+            local_keys = set(self.cache._cache.keys())
+
+        start = time.perf_counter()
+        result = func(key, value, timeout=timeout)
+        latency = time.perf_counter() - start
+
+        self.metrics.record_set(key, len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL)), latency)
+        if local_keys is not None:
+            self.metrics.record_evictions(local_keys - set(self.cache._cache.keys()))
+
+        return result
+
+    def __getattr__(self, item):
+        # the other operations are not instrumented
+        return getattr(self.cache, item)
+
+
+def get_connection_pool():
+    """
+    Returns redis connection pool shared in this process.
+    """
+    global _connection_pool
+    if _connection_pool is None:
+        _connection_pool = redis.ConnectionPool(host=CacheConfig.host, port=CacheConfig.port)
+    return _connection_pool
+
+
+def get_redis():
+    """
+    Returns redis client for the operations that cache interface doesn't support (ex. scripts, locks). Only available
+    if the cache type is redis.
+    """
+    return redis.StrictRedis(connection_pool=get_connection_pool())
+
 
 class MuzikaCache:
     """
@@ -33,15 +246,11 @@ class MuzikaCache:
         if self._cache is None:
             cache_type = CacheConfig.cache_type
             if cache_type == 'redis':
-                global _connection_pool
-                if _connection_pool is None:
-                    _connection_pool = redis.ConnectionPool(host=CacheConfig.host)
-
                 self._cache = RedisCache(
                     key_prefix=CacheConfig.key_prefix,
                     host=CacheConfig.host,
                     port=CacheConfig.port,
-                    connection_pool=_connection_pool
+                    connection_pool=get_connection_pool()
                 )
             else:
                 global _cache
@@ -51,8 +260,32 @@ class MuzikaCache:
                 else:
                     self._cache = _cache
 
+            if CacheConfig.metrics_enabled:
+                self._cache = InstrumentedCache(self._cache)
+
         return self._cache
 
     def reset(self):
         if self._cache is not None:
             self._cache = None
+
+
+def get_cache_stats():
+    """
+    Returns the cache metrics of this process. If using redis, the server-wide memory usage and the number of evicted
+    keys are also returned.
+    """
+    stats = {
+        'cache_type': CacheConfig.cache_type,
+        'namespaces': cache_metrics.snapshot()
+    }
+
+    if CacheConfig.cache_type == 'redis' and _connection_pool is not None:
+        info = get_redis().info()
+        stats.update({
+            'used_memory': info.get('used_memory'),
+            'evicted_keys': info.get('evicted_keys'),
+            'expired_keys': info.get('expired_keys'),
+        })
+
+    return stats
@@ -0,0 +1,195 @@
+"""
+ Chain.py
+
+ is a JSON-RPC client for reading many objects from the block chain at once. Web3 sends a HTTP request per call, but
+ this client sends the same calls for many transactions in a single JSON-RPC batch request. If batch size is 1 (the
+ endpoint doesn't support batch requests), the calls are sent concurrently by a bounded thread pool.
+
+ If the endpoint is not given, the requests are sent through the endpoint pool (see modules/endpoint_pool.py).
+
+ >>> chain = ChainClient()
+ >>> receipts = chain.get_transaction_receipts(['0x...', '0x...'])
+ >>> receipts['0x...'].status
+
+ The results are formatted like web3 results (AttributeDict, HexBytes, int, ...).
+"""
+
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+
+from web3.middleware.pythonic import receipt_formatter, transaction_formatter
+from web3.datastructures import AttributeDict
+
+from config import Web3ProviderConfig
+from modules.cache import MuzikaCache
+from modules.endpoint_pool import get_endpoint_pool, is_read_only
+
+__all__ = [
+    'ChainClient',
+    'JSONRPCError',
+    'map_concurrently',
+]
+
+
+class JSONRPCError(Exception):
+    pass
+
+
+def map_concurrently(func, items, max_workers=None):
+    """
+    Calls the function with each item in a bounded thread pool, for the calls that need network I/O.
+
+    Returns a dict of item and (result, exception). The items must be hashable.
+    """
+    items = list(set(items))
+    if not items:
+        return {}
+
+    max_workers = min(max_workers or Web3ProviderConfig.max_workers, len(items))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {item: executor.submit(func, item) for item in items}
+
+    results = {}
+    for item, future in futures.items():
+        exception = future.exception()
+        results[item] = (None, exception) if exception else (future.result(), None)
+    return results
+
+
+class ChainClient:
+    """
+    JSON-RPC batch client for the web3 provider endpoint.
+    """
+
+    def __init__(self, endpoint_uri=None, session=None, batch_size=None, timeout=None, cache=None):
+        from modules.web3 import get_default_session
+
+        self.endpoint_uri = endpoint_uri
+        self.pool = None if endpoint_uri else get_endpoint_pool()
+        self.session = session or get_default_session()
+        self.batch_size = batch_size or Web3ProviderConfig.batch_size
+        self.timeout = timeout or Web3ProviderConfig.timeout
+        self.cache = cache or MuzikaCache()
+        self._request_id = count()
+
+        # the number of HTTP requests sent by this client
+        self.request_count = 0
+
+        # request count is increased by multiple threads
+        self._lock = threading.Lock()
+
+    def batch_request(self, method, params_list, errors=False):
+        """
+        Calls the method with each params in batch requests and returns the results in the same order. If an error
+        occurs for a call, its result is None.
+
+        If errors is True, returns (result, error) of each call instead. The error is the JSON-RPC error object of the
+        call (ex. {'code': -32000, 'message': 'header not found'}), or None if succeeded.
+        """
+        # if the endpoint doesn't support batch requests, send the requests concurrently
+        if self.batch_size <= 1:
+            responses = self._concurrent_request(method, params_list)
+        else:
+            responses = self._batch_request(method, params_list)
+
+        if errors:
+            return [(response.get('result'), response.get('error')) for response in responses]
+        return [response.get('result') for response in responses]
+
+    def _batch_request(self, method, params_list):
+        responses = []
+        for offset in range(0, len(params_list), self.batch_size):
+            chunk = params_list[offset:offset + self.batch_size]
+            requests = [{
+                'jsonrpc': '2.0',
+                'method': method,
+                'params': params,
+                'id': next(self._request_id)
+            } for params in chunk]
+
+            batch_responses = self._post(requests)
+
+            # if the batch request itself is invalid, the endpoint responses a single error object
+            if not isinstance(batch_responses, list):
+                raise JSONRPCError(batch_responses.get('error'))
+
+            # the responses can be in any order. If a response is missing, regard it as an error.
+            response_by_id = {item.get('id'): item for item in batch_responses}
+            responses.extend([response_by_id.get(req['id'], {'error': {'message': 'No response'}})
+                              for req in requests])
+
+        return responses
+
+    def _concurrent_request(self, method, params_list):
+        def _request(index):
+            return self._post({
+                'jsonrpc': '2.0',
+                'method': method,
+                'params': params_list[index],
+                'id': index
+            })
+
+        results = map_concurrently(_request, range(len(params_list)))
+        for result, exception in results.values():
+            if exception is not None:
+                raise exception
+        return [results[index][0] for index in range(len(params_list))]
+
+    def _post(self, payload):
+        with self._lock:
+            self.request_count += 1
+
+        if self.pool is not None:
+            return json.loads(self.pool.request(json.dumps(payload), read_only=is_read_only(payload)).decode('utf-8'))
+
+        response = self.session.post(self.endpoint_uri, data=json.dumps(payload),
+                                     headers={'Content-Type': 'application/json'}, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def get_transaction_receipts(self, tx_hashes):
+        """
+        Returns a dict of transaction hash and its receipt. If the transaction is not mined yet, the receipt is None.
+
+        Since the receipts of the mined transactions never change, they are cached.
+        """
+        tx_hashes = list(set(tx_hashes))
+        receipts = {}
+
+        cached = self.cache().get_many(*[self._receipt_cache_key(tx_hash) for tx_hash in tx_hashes]) \
+            if tx_hashes else []
+        for tx_hash, receipt in zip(tx_hashes, cached):
+            if receipt is not None:
+                receipts[tx_hash] = receipt
+
+        not_cached = [tx_hash for tx_hash in tx_hashes if tx_hash not in receipts]
+        for tx_hash, receipt in zip(not_cached, self.batch_request('eth_getTransactionReceipt',
+                                                                   [[tx_hash] for tx_hash in not_cached])):
+            receipts[tx_hash] = receipt
+
+            # cache only mined transactions
+            if receipt is not None and receipt.get('blockNumber') is not None:
+                self.cache().set(self._receipt_cache_key(tx_hash), receipt,
+                                 timeout=Web3ProviderConfig.receipt_cache_timeout)
+
+        return {tx_hash: self._format(receipt, receipt_formatter) for tx_hash, receipt in receipts.items()}
+
+    def get_transactions(self, tx_hashes):
+        """
+        Returns a dict of transaction hash and its transaction. If the transaction does not exist, it is None.
+        """
+        tx_hashes = list(set(tx_hashes))
+        transactions = self.batch_request('eth_getTransactionByHash', [[tx_hash] for tx_hash in tx_hashes])
+        return {tx_hash: self._format(tx, transaction_formatter) for tx_hash, tx in zip(tx_hashes, transactions)}
+
+    @staticmethod
+    def _receipt_cache_key(tx_hash):
+        return '/chain/receipt/{}'.format(tx_hash.lower())
+
+    @staticmethod
+    def _format(result, formatter):
+        if result is None:
+            return None
+        return AttributeDict.recursive(formatter(result))
@@ -0,0 +1,48 @@
+"""
+ Checkpoint.py
+
+ persists the last block number that a block chain indexer processed, so it continues from there after restarting.
+
+ The checkpoints are saved in the table below.
+
+ CREATE TABLE `chain_checkpoints` (
+   `name` VARCHAR(64) NOT NULL,
+   `block_number` BIGINT UNSIGNED NOT NULL,
+   `updated_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+   PRIMARY KEY (`name`)
+ );
+"""
+
+from sqlalchemy import text
+
+from modules import database as db
+
+__all__ = [
+    'get_checkpoint',
+    'set_checkpoint',
+]
+
+
+def get_checkpoint(connection, name, default=None):
+    """
+    Returns the last processed block number of the checkpoint, or default if not exists.
+    """
+    checkpoint = db.statement(db.table.CHAIN_CHECKPOINTS).columns('block_number')\
+        .where(name=name).limit(1).select(connection).fetchone()
+    return checkpoint['block_number'] if checkpoint else default
+
+
+def set_checkpoint(connection, name, block_number):
+    """
+    Saves the last processed block number of the checkpoint.
+    """
+    checkpoint_query_stmt = """
+        INSERT INTO `{}`
+        SET
+          `name` = :name,
+          `block_number` = :block_number
+        ON DUPLICATE KEY UPDATE
+          `block_number` = :block_number
+    """.format(db.table.CHAIN_CHECKPOINTS)
+
+    connection.execute(text(checkpoint_query_stmt), name=name, block_number=block_number)
@@ -1,5 +1,22 @@
 
-from modules.muzika_contract import MuzikaContract
+from functools import lru_cache
+
+from eth_abi import decode_abi, encode_abi
+from eth_utils import keccak
+from hexbytes import HexBytes
+
+from config import MuzikaContractConfig
+from modules.account_address import to_checksum_address
+from modules.chain import ChainClient, JSONRPCError
+from modules.muzika_contract import MuzikaContract, MuzikaContractHandler, get_contract_factory
+
+# aggregate((address,bytes)[]) of the multicall contract returns (uint256 blockNumber, bytes[] returnData)
+MULTICALL_AGGREGATE_SELECTOR = keccak(text='aggregate((address,bytes)[])')[:4]
+
+# JSON-RPC errors of eth_call for reverted calls. Geth returns code 3 with the revert reason, and parity returns
+# -32015 (VM execution error). The older nodes return empty output (0x) instead of an error.
+REVERTED_ERROR_CODES = (3, -32015)
+REVERTED_ERROR_MESSAGES = ('revert', 'vm execution error', 'invalid opcode', 'out of gas')
 
 
 class MuzikaPaperContract(MuzikaContract):
@@ -34,3 +51,225 @@ class MuzikaPaperContract(MuzikaContract):
 
     def generate(self, seller, price, ipfs_file_hash, original_file_hash):
         return super(MuzikaPaperContract, self).generate(seller, price, ipfs_file_hash, original_file_hash)
+
+
+class PaperContractBytecodeValidator:
+    """
+    Validates that contract creation transactions deploy the muzika paper contract.
+
+    The creation input of the paper contract starts with its bytecode linked with the payment library (Dispatcher) on
+    the network, except the metadata hash at the end of the bytecode. The linked prefix is built once and only its
+    length and hash are kept, so a transaction is validated by hashing the same length of its input.
+
+    >>> validator = get_paper_contract_validator(web3.version.network)
+    >>> validator.validate(tx.input)
+    True
+    """
+
+    # the last 34 bytes of the bytecode are the metadata (swarm hash) that differs by compilation
+    METADATA_LENGTH = 34
+
+    def __init__(self, network):
+        contract_handler = MuzikaContractHandler()
+        payment_interface_contract = contract_handler.get_interface('Dispatcher')
+        bytecode = contract_handler.get_bytecode('MuzikaPaperContract')[:-self.METADATA_LENGTH * 2]
+        bytecode = bytecode.replace(
+            '__LibPaperPaymentInterface______________',
+            payment_interface_contract['networks'][network]['address'][2:]
+        )
+
+        prefix = HexBytes(bytecode)
+        self.network = network
+        self.prefix_length = len(prefix)
+        self.prefix_hash = keccak(prefix)
+
+    def validate(self, tx_input):
+        """
+        Returns whether the transaction input (hex string or bytes) starts with the linked bytecode.
+        """
+        try:
+            prefix = HexBytes(tx_input)[:self.prefix_length]
+        except (TypeError, ValueError):
+            return False
+        return len(prefix) == self.prefix_length and keccak(prefix) == self.prefix_hash
+
+    def validate_transactions(self, transactions):
+        """
+        Validates a batch of transactions. Returns a dict of the same keys with the results, and a transaction is
+        invalid if it is None or not a contract creation.
+
+        >>> validator.validate_transactions(chain.get_transactions(tx_hashes))
+        {'0x...': True, '0x...': False}
+        """
+        return {
+            key: bool(tx) and tx.get('to') is None and self.validate(tx.get('input'))
+            for key, tx in transactions.items()
+        }
+
+
+@lru_cache(maxsize=None)
+def get_paper_contract_validator(network):
+    """
+    Returns the bytecode validator for the network. It is built only once per network in a process.
+    """
+    return PaperContractBytecodeValidator(network)
+
+
+class PaperContractMulticall:
+    """
+    Reads many paper contracts at once.
+
+    The read-only calls are packed into aggregate calls of the multicall contract if it is deployed
+    (MuzikaContractConfig.multicall_address), and the aggregate calls are sent in a JSON-RPC batch request. If not
+    deployed or an aggregate call fails (it reverts if any of its calls reverts), each call is sent as an eth_call in a
+    JSON-RPC batch request.
+
+    The results are dicts of contract address and (result, exception) like `modules.chain.map_concurrently`. If the
+    call is reverted or the output cannot be decoded (ex. not a contract), the exception is ValueError. If the
+    endpoint failed to handle the call (ex. rate limit), the exception is JSONRPCError, so call it again later.
+
+    >>> multicall = PaperContractMulticall(web3)
+    >>> multicall.get_sellers(['0x...', '0x...'])
+    {'0x...': ('0x...', None), '0x...': (None, ValueError(...))}
+    >>> multicall.get_purchased(['0x...', '0x...'], wallet_address)
+    {'0x...': (True, None), '0x...': (False, None)}
+    """
+
+    def __init__(self, web3, chain=None, multicall_address=None):
+        self.factory = get_contract_factory(web3, MuzikaPaperContract.__contract_name__)
+        self.chain = chain or ChainClient()
+        self.multicall_address = multicall_address or MuzikaContractConfig.multicall_address
+
+    def get_sellers(self, contract_addresses):
+        return self._call_each(contract_addresses, 'seller')
+
+    def get_for_sale(self, contract_addresses):
+        return self._call_each(contract_addresses, 'forSale')
+
+    def get_purchased(self, contract_addresses, wallet_address):
+        return self._call_each(contract_addresses, 'isPurchased', [wallet_address])
+
+    def _call_each(self, contract_addresses, fn_name, args=None):
+        contract_addresses = list(set(contract_addresses))
+        results = self.call([(contract_address, fn_name, args) for contract_address in contract_addresses])
+        return dict(zip(contract_addresses, results))
+
+    def call(self, calls):
+        """
+        Calls the functions of the contracts, and returns (result, exception) of each call in the same order.
+
+        :param calls: list of (contract address, function name, arguments).
+        """
+        results = [None] * len(calls)
+        encoded_calls = []
+        for index, (contract_address, fn_name, args) in enumerate(calls):
+            try:
+                encoded_calls.append((index, to_checksum_address(contract_address),
+                                      HexBytes(self.factory.encodeABI(fn_name, args=args))))
+            except ValueError as e:
+                results[index] = (None, e)
+            except TypeError as e:
+                results[index] = (None, ValueError(e))
+
+        try:
+            return_data = self._execute([(address, data) for _, address, data in encoded_calls])
+        except Exception as e:
+            # if failed to request (network or endpoint problem), all calls failed but not invalid calls
+            error = JSONRPCError(e) if isinstance(e, ValueError) else e
+            for index, _, _ in encoded_calls:
+                results[index] = (None, error)
+            return results
+
+        for (index, _, _), (data, error) in zip(encoded_calls, return_data):
+            if error is not None:
+                results[index] = (None, error)
+                continue
+
+            fn_name = calls[index][1]
+            try:
+                results[index] = (self._decode(fn_name, data), None)
+            except ValueError as e:
+                results[index] = (None, e)
+
+        return results
+
+    def _execute(self, encoded_calls):
+        """
+        Returns (return data, exception) of each call. The exception is ValueError if the call is reverted, or
+        JSONRPCError if the endpoint failed to handle the call (ex. rate limit), so it can be called again later.
+        """
+        if not encoded_calls:
+            return []
+
+        if not self.multicall_address:
+            return self._batch_call(encoded_calls)
+
+        size = MuzikaContractConfig.multicall_size
+        chunks = [encoded_calls[offset:offset + size] for offset in range(0, len(encoded_calls), size)]
+        aggregated = self.chain.batch_request('eth_call', [
+            [{'to': self.multicall_address, 'data': (MULTICALL_AGGREGATE_SELECTOR +
+                                                     encode_abi(['(address,bytes)[]'], [chunk])).hex()}, 'latest']
+            for chunk in chunks
+        ], errors=True)
+
+        return_data = []
+        failed_calls = []
+        for chunk, (result, error) in zip(chunks, aggregated):
+            if error is not None and not _is_reverted(error):
+                return_data.extend([(None, JSONRPCError(error))] * len(chunk))
+                continue
+
+            try:
+                _, outputs = decode_abi(['uint256', 'bytes[]'], bytes(HexBytes(result)))
+                return_data.extend((HexBytes(output), None) for output in outputs)
+            except Exception:
+                # if the aggregate call is reverted, call them one by one
+                failed_calls.extend(range(len(return_data), len(return_data) + len(chunk)))
+                return_data.extend([(None, None)] * len(chunk))
+
+        if failed_calls:
+            for index, data in zip(failed_calls, self._batch_call([encoded_calls[index] for index in failed_calls])):
+                return_data[index] = data
+
+        return return_data
+
+    def _batch_call(self, encoded_calls):
+        results = self.chain.batch_request('eth_call', [
+            [{'to': address, 'data': data.hex()}, 'latest'] for address, data in encoded_calls
+        ], errors=True)
+
+        return_data = []
+        for result, error in results:
+            if error is None:
+                return_data.append((HexBytes(result) if result is not None else None, None))
+            elif _is_reverted(error):
+                return_data.append((None, ValueError('Reverted: {}'.format(error.get('message')))))
+            else:
+                return_data.append((None, JSONRPCError(error)))
+        return return_data
+
+    def _decode(self, fn_name, data):
+        if data is None:
+            raise ValueError('Failed to call {}'.format(fn_name))
+
+        fn_abi = next(abi for abi in self.factory.abi if abi.get('type') == 'function' and abi['name'] == fn_name)
+        output_types = [output['type'] for output in fn_abi['outputs']]
+
+        try:
+            values = decode_abi(output_types, bytes(data))
+        except Exception as e:
+            # empty output if the address is not a contract, or if the call is reverted on some nodes
+            raise ValueError('Failed to decode the output of {}: {}'.format(fn_name, e))
+
+        values = [to_checksum_address(value) if output_type == 'address' else value
+                  for output_type, value in zip(output_types, values)]
+        return values[0] if len(values) == 1 else tuple(values)
+
+
+def _is_reverted(error):
+    """
+    Returns whether the JSON-RPC error of eth_call means the call is reverted. The other errors (ex. rate limit,
+    header not found) may not occur if called again.
+    """
+    message = str(error.get('message', '')).lower()
+    return error.get('code') in REVERTED_ERROR_CODES or any(text in message for text in REVERTED_ERROR_MESSAGES)
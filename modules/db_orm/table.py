@@ -16,6 +16,8 @@ class Table:
     IPFS_FILES = 'ipfs_files'
     IPFS_FILES_PRIVATE = 'ipfs_files_private'
 
+    CHAIN_CHECKPOINTS = 'chain_checkpoints'
+
     POST_DRAFTS = 'post_drafts'
     DRAFT_BOX = 'user_post_drafts'  # @deprecated
 
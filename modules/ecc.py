@@ -1,9 +1,14 @@
 
+from functools import lru_cache
+from hashlib import sha3_256
+
 import ecdsa
 from ecdsa.util import string_to_number
 from ecdsa.numbertheory import square_root_mod_prime
 from ecdsa import ellipticcurve
 
+from config import SignatureConfig
+
 
 def uncompress_public_key(public_key):
     """
@@ -30,3 +35,121 @@ def uncompress_public_key(public_key):
     point = ellipticcurve.Point(curve, x, y, order)
     from ecdsa.util import number_to_string
     return b''.join([number_to_string(point.x(), order), number_to_string(point.y(), order)])
+
+
+class EcdsaVerifyBackend:
+    """
+    Verifies NIST P-256 signatures by python-ecdsa (pure python).
+    """
+    name = 'ecdsa'
+
+    def prepare(self, point):
+        return ecdsa.VerifyingKey.from_string(point, curve=ecdsa.NIST256p)
+
+    def verify(self, key, signature, message):
+        try:
+            return key.verify(signature, message, hashfunc=sha3_256)
+        except ecdsa.keys.BadSignatureError:
+            return False
+
+
+class CryptographyVerifyBackend:
+    """
+    Verifies NIST P-256 signatures by OpenSSL (cryptography package). Raises ImportError if not installed.
+    """
+    name = 'cryptography'
+
+    def __init__(self):
+        from cryptography.exceptions import InvalidSignature
+        from cryptography.hazmat.backends import default_backend
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import ec, utils
+
+        self.invalid_signature = InvalidSignature
+        self.backend = default_backend()
+        self.ec = ec
+        self.encode_dss_signature = utils.encode_dss_signature
+        # the message is hashed by sha3-256 before verification, and its digest size is same as sha256
+        self.algorithm = ec.ECDSA(utils.Prehashed(hashes.SHA256()))
+
+    def prepare(self, point):
+        point = b'\x04' + point
+        if hasattr(self.ec.EllipticCurvePublicKey, 'from_encoded_point'):
+            return self.ec.EllipticCurvePublicKey.from_encoded_point(self.ec.SECP256R1(), point)
+        return self.ec.EllipticCurvePublicNumbers.from_encoded_point(self.ec.SECP256R1(), point)\
+            .public_key(self.backend)
+
+    def verify(self, key, signature, message):
+        signature = self.encode_dss_signature(string_to_number(signature[:32]), string_to_number(signature[32:]))
+        try:
+            key.verify(signature, sha3_256(message).digest(), self.algorithm)
+            return True
+        except self.invalid_signature:
+            return False
+
+
+VERIFY_BACKENDS = {
+    CryptographyVerifyBackend.name: CryptographyVerifyBackend,
+    EcdsaVerifyBackend.name: EcdsaVerifyBackend,
+}
+
+# backend instances created by get_verify_backend
+_verify_backends = {}
+
+
+def get_verify_backend(name=None):
+    """
+    Returns a verification backend. If name is None, use the configured backend. If the configured backend is 'auto',
+    use cryptography if available, nor ecdsa.
+    """
+    name = name or SignatureConfig.ont_verify_backend
+
+    if name not in _verify_backends:
+        if name == 'auto':
+            try:
+                backend = CryptographyVerifyBackend()
+            except ImportError:
+                backend = EcdsaVerifyBackend()
+        else:
+            backend = VERIFY_BACKENDS[name]()
+        _verify_backends[name] = backend
+
+    return _verify_backends[name]
+
+
+@lru_cache(maxsize=SignatureConfig.ont_key_cache_size)
+def _prepare_verifying_key(backend_name, public_key):
+    if public_key.startswith(b'\x02') or public_key.startswith(b'\x03'):
+        # compressed public key needs to be uncompressed (modular square root)
+        point = uncompress_public_key(public_key)
+    elif public_key.startswith(b'\x04'):
+        point = public_key[1:]
+    else:
+        raise ValueError('Invalid public key format')
+
+    if len(point) != 64:
+        raise ValueError('Invalid public key length')
+
+    return get_verify_backend(backend_name).prepare(point)
+
+
+def verify_signature(public_key, signature, message, backend=None):
+    """
+    Verifies the NIST P-256 signature of the message hashed by sha3-256, which is used by ontology accounts.
+
+    The verifying keys are prepared once and cached by the public key bytes, so the wallets that sign in repeatedly
+    don't need to uncompress the public key again.
+
+    :param public_key: compressed or uncompressed public key bytes.
+    :param signature: 64 bytes signature (r, s).
+    :param message: message bytes.
+    :param backend: verification backend name. If None, use the backend configured in config.py.
+    :return: True if valid signature, nor False. If invalid public key, raise ValueError.
+    """
+    verify_backend = get_verify_backend(backend)
+    key = _prepare_verifying_key(verify_backend.name, bytes(public_key))
+
+    if len(signature) != 64:
+        return False
+
+    return verify_backend.verify(key, bytes(signature), message)
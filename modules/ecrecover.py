@@ -0,0 +1,108 @@
+"""
+ Ecrecover.py
+
+ recovers the ethereum address that signed a message hash. The recovery is CPU-bound, so it uses libsecp256k1 (by
+ coincurve binding) if it is installed, and eth_account (pure python in our stack) if not.
+
+ >>> recover_address(message_hash, signature)
+ '0x5aAeb6053F3E94C9b9A09f33669435E7Ef1BeAed'
+
+ The backend can be chosen by SignatureConfig.recovery_backend in config.py ('auto', 'coincurve' or 'eth_account').
+"""
+
+from eth_utils import keccak, to_checksum_address
+from hexbytes import HexBytes
+
+from config import SignatureConfig
+
+__all__ = [
+    'recover_address',
+    'get_recovery_backend',
+    'RECOVERY_BACKENDS',
+]
+
+
+class EthAccountRecoveryBackend:
+    """
+    Recovers by eth_account, same as web3.eth.account.recoverHash.
+    """
+    name = 'eth_account'
+
+    def __init__(self):
+        from eth_account import Account
+        self.account = Account
+
+    def recover(self, message_hash, signature):
+        return self.account.recoverHash(message_hash, signature=signature)
+
+
+class CoinCurveRecoveryBackend:
+    """
+    Recovers by libsecp256k1. Raises ImportError if coincurve is not installed.
+    """
+    name = 'coincurve'
+
+    def __init__(self):
+        import coincurve
+        self.public_key_class = coincurve.PublicKey
+
+    def recover(self, message_hash, signature):
+        signature = HexBytes(signature)
+        message_hash = HexBytes(message_hash)
+
+        if len(signature) != 65 or len(message_hash) != 32:
+            raise ValueError('Invalid signature or message hash length')
+
+        # the last byte of the signature is v (27 or 28), but libsecp256k1 needs recovery id (0 or 1)
+        v = signature[64]
+        if v in (27, 28):
+            v -= 27
+        elif v not in (0, 1):
+            raise ValueError('Invalid signature v value')
+
+        try:
+            public_key = self.public_key_class.from_signature_and_message(
+                bytes(signature[:64]) + bytes([v]), bytes(message_hash), hasher=None
+            ).format(compressed=False)
+        except Exception:
+            # coincurve raises a bare Exception if failed to recover
+            raise ValueError('Failed to recover public key')
+
+        # address is the last 20 bytes of keccak hash of the public key (without 0x04 prefix)
+        return to_checksum_address(keccak(public_key[1:])[-20:])
+
+
+RECOVERY_BACKENDS = {
+    CoinCurveRecoveryBackend.name: CoinCurveRecoveryBackend,
+    EthAccountRecoveryBackend.name: EthAccountRecoveryBackend,
+}
+
+# backend instances created by get_recovery_backend
+_backends = {}
+
+
+def get_recovery_backend(name=None):
+    """
+    Returns a recovery backend. If name is None, use the configured backend. If the configured backend is 'auto',
+    use coincurve if available, nor eth_account.
+    """
+    name = name or SignatureConfig.recovery_backend
+
+    if name not in _backends:
+        if name == 'auto':
+            try:
+                backend = CoinCurveRecoveryBackend()
+            except ImportError:
+                backend = EthAccountRecoveryBackend()
+        else:
+            backend = RECOVERY_BACKENDS[name]()
+        _backends[name] = backend
+
+    return _backends[name]
+
+
+def recover_address(message_hash, signature, backend=None):
+    """
+    Returns the checksum address that signed the message hash. If invalid signature, raise ValueError.
+    """
+    return get_recovery_backend(backend).recover(message_hash, signature)
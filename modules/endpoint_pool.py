@@ -0,0 +1,263 @@
+"""
+ Endpoint_pool.py
+
+ sends JSON-RPC requests to multiple endpoints of the block chain network (Web3ProviderConfig.endpoint_urls).
+
+    - latency: the latency of each endpoint is tracked by EWMA, and the fastest endpoint is tried first.
+    - hedging: if a read request is not responded in the hedge delay, the same request is sent to the next endpoint
+      and the first response is used.
+    - failover: if an endpoint fails (connection error, timeout, 5xx or 429), the request is sent to the next endpoint.
+      Write requests are only sent again if they were not handled (connection error, 429, 502 or 503).
+    - ejection: if an endpoint fails `failure_threshold` times in a row, it is ejected for `ejection_time` seconds
+      (doubled on every ejection in a row up to `max_ejection_time`). After that, a read request is sent to the endpoint
+      as a probe, and it comes back if the probe succeeds.
+    - circuit breaking: if all endpoints are ejected, requests fail immediately with EndpointUnavailable instead of
+      waiting for timeouts.
+
+ >>> pool = get_endpoint_pool()
+ >>> pool.request(b'{"jsonrpc": "2.0", "method": "eth_blockNumber", "params": [], "id": 1}', read_only=True)
+ b'{"jsonrpc":"2.0","id":1,"result":"0x3c7a1b"}'
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+
+from config import Web3ProviderConfig
+
+__all__ = [
+    'EndpointPool',
+    'EndpointUnavailable',
+    'READ_METHODS',
+    'get_endpoint_pool',
+    'is_read_only',
+]
+
+# JSON-RPC methods that don't change anything, so they can be sent to multiple endpoints at the same time
+READ_METHODS = frozenset([
+    'net_version',
+    'eth_accounts',
+    'eth_blockNumber',
+    'eth_call',
+    'eth_chainId',
+    'eth_estimateGas',
+    'eth_gasPrice',
+    'eth_getBalance',
+    'eth_getBlockByHash',
+    'eth_getBlockByNumber',
+    'eth_getCode',
+    'eth_getLogs',
+    'eth_getTransactionByHash',
+    'eth_getTransactionCount',
+    'eth_getTransactionReceipt',
+])
+
+# HTTP status codes that mean the endpoint cannot handle the requests now
+FAILURE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# HTTP status codes that mean the request is not handled, so a write request can be sent to the other endpoint
+NOT_HANDLED_STATUS_CODES = (429, 502, 503)
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+class EndpointUnavailable(IOError):
+    pass
+
+
+def is_read_only(payload):
+    """
+    Returns whether the JSON-RPC request (or batch request) only reads.
+    """
+    requests_ = payload if isinstance(payload, list) else [payload]
+    return all(item.get('method') in READ_METHODS for item in requests_)
+
+
+class Endpoint:
+    def __init__(self, url):
+        self.url = url
+
+        # EWMA of the response time (seconds). None if never responded.
+        self.latency = None
+
+        # consecutive failures and ejections
+        self.failures = 0
+        self.ejections = 0
+
+        # ejected until this time (time.monotonic). None if not ejected.
+        self.ejected_until = None
+
+        # whether a probe request is being sent after ejection
+        self.probing = False
+
+    def __repr__(self):
+        return '<Endpoint {} latency={} failures={}>'.format(self.url, self.latency, self.failures)
+
+
+class EndpointPool:
+    """
+    JSON-RPC endpoints with latency tracking, hedging, failover, ejection and circuit breaking.
+    """
+
+    def __init__(self, urls=None, session=None, timeout=None):
+        from modules.web3 import get_default_session
+
+        self.endpoints = [Endpoint(url) for url in (urls or Web3ProviderConfig.endpoint_urls)]
+        self.session = session or get_default_session()
+        self.timeout = timeout or Web3ProviderConfig.timeout
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=Web3ProviderConfig.pool_maxsize)
+
+    def request(self, data, read_only=False):
+        """
+        Sends the encoded JSON-RPC request and returns the response body. If all endpoints failed, raise the last error.
+        """
+        endpoints, probes = self._select(read_only)
+
+        if read_only and len(endpoints) > 1:
+            return self._hedged_request(endpoints, probes, data)
+
+        error = None
+        for endpoint in endpoints:
+            try:
+                return self._send(endpoint, data, probe=endpoint in probes)
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+                # if the request may have been handled, don't send a write request again
+                if not read_only and not self._not_handled(e):
+                    raise
+                error = e
+        raise error
+
+    @staticmethod
+    def _not_handled(error):
+        if isinstance(error, requests.HTTPError):
+            return error.response is not None and error.response.status_code in NOT_HANDLED_STATUS_CODES
+        return isinstance(error, requests.ConnectionError)
+
+    def stats(self):
+        """
+        Returns the state of the endpoints.
+        """
+        now = time.monotonic()
+        with self._lock:
+            return [{
+                'url': endpoint.url,
+                'latency': endpoint.latency,
+                'failures': endpoint.failures,
+                'ejected': endpoint.ejected_until is not None,
+                'ejected_for': max(0, endpoint.ejected_until - now) if endpoint.ejected_until is not None else 0,
+            } for endpoint in self.endpoints]
+
+    def _select(self, read_only=False):
+        """
+        Returns the endpoints to try in order, and the ejected endpoints probed by this request. An ejected endpoint
+        that can be probed comes first, and the others are sorted by latency (not measured endpoints first).
+
+        Only read requests probe the ejected endpoints, since a write request cannot be sent again if the half-dead
+        endpoint times out.
+        """
+        now = time.monotonic()
+        with self._lock:
+            probes = []
+            for endpoint in self.endpoints:
+                if read_only and endpoint.ejected_until is not None and endpoint.ejected_until <= now \
+                        and not endpoint.probing:
+                    endpoint.probing = True
+                    probes.append(endpoint)
+
+            available = sorted([endpoint for endpoint in self.endpoints if endpoint.ejected_until is None],
+                               key=lambda endpoint: endpoint.latency or 0)
+
+        if not probes and not available:
+            raise EndpointUnavailable('All endpoints are ejected')
+
+        return probes + available, set(probes)
+
+    def _hedged_request(self, endpoints, probes, data):
+        remaining = list(endpoints)
+        pending = set()
+        error = None
+
+        while remaining or pending:
+            # send to the next endpoint if the previous endpoints failed or didn't respond in the hedge delay
+            timeout = None
+            if remaining:
+                endpoint = remaining.pop(0)
+                pending.add(self._executor.submit(self._send, endpoint, data, endpoint in probes))
+                if remaining:
+                    timeout = self._hedge_delay(endpoint)
+
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+
+        raise error
+
+    def _hedge_delay(self, endpoint):
+        latency = endpoint.latency or 0
+        return min(self.timeout, max(Web3ProviderConfig.hedge_delay, latency * Web3ProviderConfig.hedge_latency_factor))
+
+    def _send(self, endpoint, data, probe=False):
+        start = time.monotonic()
+        try:
+            response = self.session.post(endpoint.url, data=data, headers={'Content-Type': 'application/json'},
+                                         timeout=self.timeout)
+            response.raise_for_status()
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code in FAILURE_STATUS_CODES:
+                self._record_failure(endpoint, probe)
+            else:
+                self._record_success(endpoint, time.monotonic() - start)
+            raise
+        except requests.RequestException:
+            self._record_failure(endpoint, probe)
+            raise
+        else:
+            self._record_success(endpoint, time.monotonic() - start)
+            return response.content
+        finally:
+            # if not recorded by an unexpected error, the probe is done anyway, so the endpoint can be probed again
+            if probe:
+                with self._lock:
+                    endpoint.probing = False
+
+    def _record_success(self, endpoint, elapsed):
+        decay = Web3ProviderConfig.latency_decay
+        with self._lock:
+            endpoint.latency = elapsed if endpoint.latency is None else (1 - decay) * endpoint.latency + decay * elapsed
+            endpoint.failures = 0
+            endpoint.ejections = 0
+            endpoint.ejected_until = None
+
+    def _record_failure(self, endpoint, probe=False):
+        with self._lock:
+            endpoint.failures += 1
+
+            # if the probe failed or failed too many times, eject the endpoint
+            if probe or (endpoint.ejected_until is None and endpoint.failures >= Web3ProviderConfig.failure_threshold):
+                ejection_time = min(Web3ProviderConfig.max_ejection_time,
+                                    Web3ProviderConfig.ejection_time * 2 ** endpoint.ejections)
+                endpoint.ejected_until = time.monotonic() + ejection_time
+                endpoint.ejections += 1
+
+
+def get_endpoint_pool():
+    """
+    Returns the endpoint pool shared in the process. It is not shared with the forked processes (ex. celery workers).
+    """
+    global _pool, _pool_pid
+
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = EndpointPool()
+                _pool_pid = os.getpid()
+
+    return _pool
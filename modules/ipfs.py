@@ -1,9 +1,17 @@
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import ipfsapi
+import requests
 from sqlalchemy import text
 
 from config import IPFSConfig
 from modules import database as db
+from modules.cache import MuzikaCache
+from modules.chain import map_concurrently
+
+# the meta files are fetched from the gateways in the shared threads, up to `IPFSConfig.crawl_concurrency` at a time
+_gateway_executor = ThreadPoolExecutor(max_workers=len(IPFSConfig.gateways) * IPFSConfig.crawl_concurrency)
 
 
 class RelayIpfs:
@@ -52,10 +60,13 @@ def register_object(connection, ipfs_hash, file_type, aes_key=None, name=None, t
 
 
 def track_object(connection, ipfs_file_id=None, ipfs_object=None, **kwargs):
+    """
+    Tracks the IPFS object and all objects under it (see `crawl_objects`).
+    """
     if ipfs_file_id:
         object_query = """
             SELECT `f`.*, `p`.`aes_key`  FROM `{}` `f`
-            INNER JOIN `{}` `p`
+            LEFT JOIN `{}` `p`
             ON (`f`.`file_id` = `p`.`file_id`)
             WHERE `f`.`file_id` = :ipfs_file_id
             LIMIT 1
@@ -69,91 +80,246 @@ def track_object(connection, ipfs_file_id=None, ipfs_object=None, **kwargs):
 
         ipfs_object = db.to_relation_model(ipfs_object)
 
-    ipfs_file_id = ipfs_object['file_id']
-    root_ipfs_hash = ipfs_object['ipfs_hash']
-    file_type = ipfs_object['file_type']
-    aes_key = ipfs_object.get('aes_key')
-    name = ipfs_object.get('name', '')
-    root_id = kwargs.get('root_id') or ipfs_file_id
+    if kwargs.get('root_id'):
+        ipfs_object = dict(ipfs_object, root_id=kwargs['root_id'])
+
+    crawl_objects(connection, [ipfs_object], timeout=kwargs.get('timeout', '30s'))
+
+
+def list_objects(ipfs_hashes, timeout='30s', cache=None):
+    """
+    Lists the links of the IPFS objects concurrently (up to `IPFSConfig.crawl_concurrency` requests at a time). Each
+    hash is listed only once even if duplicated.
+
+    The links of an IPFS hash never change, so they are cached by the hash. The objects already listed (ex. a directory
+    reused by another contract) need no IPFS request.
+
+    Returns a dict of IPFS hash and its links, or None if failed to list (ex. timeout).
+    """
+    cache = cache or MuzikaCache()
+    ipfs_hashes = list(set(ipfs_hashes))
+
+    links = {}
+    cached = cache().get_many(*[_links_cache_key(ipfs_hash) for ipfs_hash in ipfs_hashes]) if ipfs_hashes else []
+    for ipfs_hash, object_links in zip(ipfs_hashes, cached):
+        if object_links is not None:
+            links[ipfs_hash] = object_links
 
-    if name == '/' or name is None:
-        name = ''
+    not_cached = [ipfs_hash for ipfs_hash in ipfs_hashes if ipfs_hash not in links]
+    if not not_cached:
+        return links
 
     ipfs = RelayIpfs().get_connection()
 
-    try:
-        # query object links. If timeout, it will raise Timeout Error
-        object_links = ipfs.ls(root_ipfs_hash, opts={
-            'timeout': kwargs.get('timeout', '30s')
-        })['Objects'][0]['Links']
-    except ipfsapi.exceptions.ErrorResponse:
+    def _ls(ipfs_hash):
+        return ipfs.ls(ipfs_hash, opts={'timeout': timeout})['Objects'][0]['Links']
+
+    for ipfs_hash, (object_links, exception) in map_concurrently(_ls, not_cached,
+                                                                 max_workers=IPFSConfig.crawl_concurrency).items():
+        if isinstance(exception, ipfsapi.exceptions.ErrorResponse):
+            links[ipfs_hash] = None
+            continue
+        elif exception is not None:
+            raise exception
+
+        # cache only the fields used for tracking
+        links[ipfs_hash] = [{key: link[key] for key in ('Name', 'Hash', 'Type', 'Size')} for link in object_links]
+        cache().set(_links_cache_key(ipfs_hash), links[ipfs_hash], timeout=IPFSConfig.links_cache_timeout)
+
+    return links
+
+
+def _links_cache_key(ipfs_hash):
+    return '/ipfs/links/{}'.format(ipfs_hash)
+
+
+def track_objects(connection, ipfs_objects, timeout='30s', listed=None):
+    """
+    Tracks the pending IPFS objects together and writes the results in bulk. Unlike `track_object`, the linked
+    directories are inserted as pending objects and tracked by the next call (see works/track_ipfs_files.py).
+
+    :param connection: database connection.
+    :param ipfs_objects: IPFS file rows with `aes_key` (None if not encrypted).
+    :param timeout: timeout for listing an IPFS object.
+    :param listed: the links of the IPFS objects already listed. The new listings are added to it.
+    :return: the file ids of the objects tracked successfully.
+    """
+    links = {} if listed is None else listed
+    links.update(list_objects([ipfs_object['ipfs_hash'] for ipfs_object in ipfs_objects
+                               if ipfs_object['ipfs_hash'] not in links], timeout=timeout))
+
+    disabled_params = []
+    file_params = []
+    directory_params = []
+    link_params = []
+    aes_keys = {}
+
+    for ipfs_object in ipfs_objects:
+        ipfs_file_id = ipfs_object['file_id']
+        object_links = links[ipfs_object['ipfs_hash']]
+        root_id = ipfs_object.get('root_id') or ipfs_file_id
+        aes_key = ipfs_object.get('aes_key')
+        name = ipfs_object.get('name') or ''
+
+        if name == '/':
+            name = ''
+
         # if timeout error, set status to "disabled"
-        db.Statement(db.table.IPFS_FILES)\
-            .set(status='disabled')\
-            .where(file_id=ipfs_file_id)\
-            .update(connection)
-        return
-
-    # if no object links, this object is just a file
-    if not len(object_links):
-        db.Statement(db.table.IPFS_FILES)\
-            .set(ipfs_object_type='file', root_id=root_id, status='success')\
-            .where(file_id=ipfs_file_id)\
-            .update(connection)
-
-    # if having object links, this object is a directory and insert files
-    else:
-        db.Statement(db.table.IPFS_FILES)\
-            .set(ipfs_object_type='directory', root_id=root_id, name=name if name else '/', status='success')\
-            .where(file_id=ipfs_file_id)\
-            .update(connection)
+        if object_links is None:
+            disabled_params.append({'file_id': ipfs_file_id})
+            continue
+
+        # if no object links, this object is just a file
+        if not len(object_links):
+            file_params.append({'file_id': ipfs_file_id, 'root_id': root_id})
+            continue
+
+        # if having object links, this object is a directory and insert files
+        directory_params.append({'file_id': ipfs_file_id, 'root_id': root_id, 'name': name if name else '/'})
+        if aes_key:
+            aes_keys[ipfs_file_id] = aes_key
 
         for link in object_links:
-            link_object = {
+            is_directory = link['Type'] == 1
+            link_params.append({
                 'parent_id': ipfs_file_id,
-                'file_type': file_type,
+                'file_type': ipfs_object['file_type'],
                 'ipfs_hash': link['Hash'],
                 'encrypted': True if aes_key else False,
                 'name': '/'.join([name, link['Name']]),
-                'root_id': root_id
-            }
-
-            # if the linked object is directory
-            if link['Type'] == 1:
-                link_object.update({
-                    'ipfs_object_type': 'directory',
-                    'status': 'pending'
-                })
-
-                # track recursively
-                # track_object(connection, ipfs_object=link_object, **kwargs)
-
-            # if the linked object is file (Type == 2)
-            else:
-                link_object.update({
-                    'file_size': link['Size'],
-                    'ipfs_object_type': 'file',
-                    'status': 'success'
-                })
-
-                # db.Statement(db.table.IPFS_FILES).set(**link_object).insert(connection)
-
-            # insert an directory object in this IPFS object
-            link_object.update({
-                'file_id': db.Statement(db.table.IPFS_FILES).set(**link_object).insert(connection).lastrowid
+                'root_id': root_id,
+                # the linked directories are tracked later
+                'ipfs_object_type': 'directory' if is_directory else 'file',
+                'file_size': None if is_directory else link['Size'],
+                'status': 'pending' if is_directory else 'success'
             })
 
-            # if aes_key exists, insert AES KEY into the private table
-            if aes_key:
-                db.Statement(db.table.IPFS_FILES_PRIVATE)\
-                    .set(file_id=link_object['file_id'], aes_key=aes_key)\
-                    .insert(connection)
-                link_object.update({'aes_key': aes_key})
-
-            # if directory, track recursively
-            if link['Type'] == 1:
-                kwargs.update({'root_id': root_id})
-                track_object(connection, ipfs_object=link_object, **kwargs)
+    update_query_statement = """
+        UPDATE `{}`
+        SET
+          `ipfs_object_type` = :ipfs_object_type,
+          `root_id` = :root_id,
+          `name` = COALESCE(:name, `name`),
+          `status` = 'success'
+        WHERE `file_id` = :file_id
+    """.format(db.table.IPFS_FILES)
+
+    link_query_statement = """
+        INSERT INTO `{}`
+          (`parent_id`, `file_type`, `ipfs_hash`, `encrypted`, `name`, `root_id`, `ipfs_object_type`, `file_size`,
+           `status`)
+        VALUES
+          (:parent_id, :file_type, :ipfs_hash, :encrypted, :name, :root_id, :ipfs_object_type, :file_size, :status)
+    """.format(db.table.IPFS_FILES)
+
+    private_query_statement = """
+        INSERT INTO `{}` (`file_id`, `aes_key`) VALUES (:file_id, :aes_key)
+    """.format(db.table.IPFS_FILES_PRIVATE)
+
+    if disabled_params:
+        connection.execute(text("UPDATE `{}` SET `status` = 'disabled' WHERE `file_id` = :file_id"
+                                .format(db.table.IPFS_FILES)), *disabled_params)
+
+    if file_params or directory_params:
+        connection.execute(text(update_query_statement), *(
+            [dict(params, ipfs_object_type='file', name=None) for params in file_params] +
+            [dict(params, ipfs_object_type='directory') for params in directory_params]
+        ))
+
+    if link_params:
+        connection.execute(text(link_query_statement), *link_params)
+
+    # if aes_key exists, insert AES KEY of the linked objects into the private table
+    if aes_keys:
+        linked_objects = db.statement(db.table.IPFS_FILES).columns('file_id', 'parent_id')\
+            .where(parent_id=list(aes_keys.keys())).select(connection).fetchall()
+        connection.execute(text(private_query_statement), *[
+            {'file_id': linked_object['file_id'], 'aes_key': aes_keys[linked_object['parent_id']]}
+            for linked_object in linked_objects
+        ])
+
+    return [params['file_id'] for params in file_params + directory_params]
+
+
+def crawl_objects(connection, ipfs_objects, timeout='30s', max_depth=None, max_objects=None):
+    """
+    Tracks the IPFS objects and the objects under them breadth-first. The directories in a level are listed
+    concurrently, and the rows of the level are written in bulk before going to the next level.
+
+        - duplicates: a directory hash is listed only once in a crawl even if it is linked in many places.
+        - cycles: a directory linking to its ancestor is disabled instead of being tracked forever.
+        - budget: the crawl stops after `max_depth` levels or `max_objects` linked objects, even in the middle of a
+          level. The directories not tracked yet stay pending, so they are tracked later (see
+          works/track_ipfs_files.py).
+
+    :param connection: database connection.
+    :param ipfs_objects: IPFS file rows with `aes_key` (None if not encrypted).
+    :param timeout: timeout for listing an IPFS object.
+    :param max_depth: maximum levels to track. Default is `IPFSConfig.crawl_max_depth`.
+    :param max_objects: maximum linked objects to write. Default is `IPFSConfig.crawl_max_objects`.
+    :return: the file ids of the objects tracked successfully.
+    """
+    max_depth = max_depth or IPFSConfig.crawl_max_depth
+    max_objects = max_objects or IPFSConfig.crawl_max_objects
+
+    listed = {}
+    tracked = []
+    object_count = 0
+
+    # the directory hashes from the root to each object, to detect cycles
+    ancestors = {ipfs_object['file_id']: frozenset() for ipfs_object in ipfs_objects}
+
+    level = list(ipfs_objects)
+    for depth in range(max_depth):
+        cyclic = [ipfs_object for ipfs_object in level if ipfs_object['ipfs_hash'] in ancestors[ipfs_object['file_id']]]
+        if cyclic:
+            connection.execute(text("UPDATE `{}` SET `status` = 'disabled' WHERE `file_id` = :file_id"
+                                    .format(db.table.IPFS_FILES)),
+                               *[{'file_id': ipfs_object['file_id']} for ipfs_object in cyclic])
+            cyclic_ids = set(ipfs_object['file_id'] for ipfs_object in cyclic)
+            level = [ipfs_object for ipfs_object in level if ipfs_object['file_id'] not in cyclic_ids]
+
+        if not level:
+            break
+
+        # track only the objects whose links fit in the budget (at least one to make progress). The rest of the level
+        # stays pending.
+        listed.update(list_objects([ipfs_object['ipfs_hash'] for ipfs_object in level
+                                    if ipfs_object['ipfs_hash'] not in listed], timeout=timeout))
+        budgeted = []
+        for ipfs_object in level:
+            link_count = len(listed[ipfs_object['ipfs_hash']] or [])
+            if budgeted and object_count + link_count > max_objects:
+                break
+            budgeted.append(ipfs_object)
+            object_count += link_count
+        exhausted = len(budgeted) < len(level)
+        level = budgeted
+
+        tracked_ids = track_objects(connection, level, timeout=timeout, listed=listed)
+        tracked.extend(tracked_ids)
+
+        tracked_ids = set(tracked_ids)
+        parents = {ipfs_object['file_id']: ipfs_object for ipfs_object in level
+                   if ipfs_object['file_id'] in tracked_ids and listed[ipfs_object['ipfs_hash']]}
+
+        if not parents or exhausted or depth + 1 == max_depth or object_count >= max_objects:
+            break
+
+        # the linked directories are inserted as pending, so track them in the next level
+        directories = db.statement(db.table.IPFS_FILES)\
+            .columns('file_id', 'parent_id', 'file_type', 'ipfs_hash', 'name', 'root_id')\
+            .where(parent_id=list(parents.keys()), ipfs_object_type='directory', status='pending')\
+            .select(connection).fetchall()
+
+        level = []
+        for directory in db.to_relation_model_list(directories):
+            parent = parents[directory['parent_id']]
+            directory['aes_key'] = parent.get('aes_key')
+            ancestors[directory['file_id']] = ancestors[parent['file_id']] | {parent['ipfs_hash']}
+            level.append(directory)
+
+    return tracked
 
 
 def translate_contract(connection, contract_id=None):
@@ -173,13 +339,62 @@ def translate_contract(connection, contract_id=None):
     if not ipfs_object:
         raise ValueError('ipfs object does not exist.')
 
-    import requests
+    meta = get_meta(ipfs_object['ipfs_hash'])
+
+    db.statement(db.table.MUSIC_CONTRACTS).set(meta=meta).where(contract_id=contract_id).update(connection)
 
-    root_hash = ipfs_object['ipfs_hash']
-    meta_query_url = 'https://ipfs.io/ipfs/{root_hash}/meta.json'.format(root_hash=root_hash)
-    req = requests.get(meta_query_url)
 
-    if req.status_code != 200:
+def get_meta(root_hash, cache=None):
+    """
+    Returns the meta.json file in the IPFS object.
+
+    It is read from the relay node first, since the uploaded files are usually pinned there. If the node doesn't
+    have it, the same request is sent to all `IPFSConfig.gateways` and the first response is used. The meta file of a
+    hash never changes, so it is cached by the hash. If not found, the hash is not looked up again for
+    `IPFSConfig.meta_missing_timeout`.
+
+    :raise ValueError: if the meta file is not found.
+    """
+    cache = cache or MuzikaCache()
+    cache_key = '/ipfs/meta/{}'.format(root_hash)
+    missing_cache_key = '/ipfs/meta-missing/{}'.format(root_hash)
+
+    meta, missing = cache().get_many(cache_key, missing_cache_key)
+    if meta is not None:
+        return meta
+    if missing:
         raise ValueError('cannot find meta file')
 
-    db.statement(db.table.MUSIC_CONTRACTS).set(meta=req.text).where(contract_id=contract_id).update(connection)
\ No newline at end of file
+    meta = _cat_meta(root_hash)
+    if meta is None:
+        meta = _fetch_meta_from_gateways(root_hash)
+    if meta is None:
+        cache().set(missing_cache_key, True, timeout=IPFSConfig.meta_missing_timeout)
+        raise ValueError('cannot find meta file')
+
+    cache().set(cache_key, meta, timeout=IPFSConfig.links_cache_timeout)
+    return meta
+
+
+def _cat_meta(root_hash):
+    try:
+        ipfs = RelayIpfs().get_connection()
+        return ipfs.cat('{}/meta.json'.format(root_hash), opts={'timeout': IPFSConfig.meta_timeout}).decode('utf-8')
+    except (ipfsapi.exceptions.Error, UnicodeDecodeError):
+        return None
+
+
+def _fetch_meta_from_gateways(root_hash):
+    def _get(gateway):
+        response = requests.get('{}/ipfs/{}/meta.json'.format(gateway, root_hash),
+                                timeout=IPFSConfig.gateway_timeout)
+        response.raise_for_status()
+        return response.text
+
+    futures = [_gateway_executor.submit(_get, gateway) for gateway in IPFSConfig.gateways]
+
+    # don't wait for the slower gateways
+    for future in as_completed(futures):
+        if future.exception() is None:
+            return future.result()
+    return None
@@ -29,7 +29,7 @@ def generate_jwt_token(connection, web3, address, signature, protocol='eth', **k
     Validate the user signature and if authenticated, generate a new JWT token for the user.
 
     :param connection: database connection.
-    :param web3: web3(ethereum) instance.
+    :param web3: web3(ethereum) instance. It can be None since signing in doesn't need to access block chain.
     :param address: the wallet address of the user.
     :param signature_version: signature creation type (Trezur, Metamask signature creation type)
     :param signature: message signed by user's wallet.
@@ -38,22 +38,28 @@ def generate_jwt_token(connection, web3, address, signature, protocol='eth', **k
     """
     import arrow
     import datetime
-    from config import AppConfig
+    from config import AppConfig, SignMessageConfig
+    from modules.account_address import to_checksum_address
     from modules.sign_message import (
         generate_random_sign_message, register_sign_message_by_id, expire_sign_message
     )
     from modules.signature import validate_signature
     from modules.sign_message import get_message_for_user
+    from modules.user import expire_user_profile
 
     # if first sign in, get message not by sign message id since db doesn't have it
     signature_version = kwargs.get('signature_version')
     default_user_name = kwargs.get('default_user_name', None)
     platform_type = kwargs.get('platform_type')
-    checksum_address = web3.toChecksumAddress(address) if protocol == 'eth' else address
-
     if platform_type not in PLATFORM_TYPES:
         return None
 
+    try:
+        checksum_address = to_checksum_address(address) if protocol == 'eth' else address
+    except ValueError:
+        # invalid address format
+        return None
+
     """
     Get sign message and its private key. Private key is not account private key, but it's the
     internally saved random bytes in database for random hashing. The private key is used for 
@@ -90,6 +96,8 @@ def generate_jwt_token(connection, web3, address, signature, protocol='eth', **k
         if default_user_name is not None:
             user_id = db.statement(db.table.USERS).set(address=checksum_address,
                                                        name=default_user_name).insert(connection).lastrowid
+            # the address may be cached as an unknown user
+            expire_user_profile(checksum_address)
         else:
             return None
 
@@ -111,12 +119,15 @@ def generate_jwt_token(connection, web3, address, signature, protocol='eth', **k
         'iss': AppConfig.issuer,
         'aud': AppConfig.issuer,
         'iat': tz - datetime.timedelta(seconds=60),
-        'exp': tz + datetime.timedelta(days=30)
+        'exp': tz + datetime.timedelta(seconds=SignMessageConfig.jwt_expired_time)
     }
 
     # if validated, expire the message, so never use the sign message anymore.
     expire_sign_message(address)
 
+    # the cached sessions of the user should be verified again after signing in.
+    expire_sessions(checksum_address)
+
     # return JWT token
     return jwt.encode(payload=payload, key=JWT_SECRET_KEY, algorithm='HS256',
                       headers={'jti': payload['jti']}).decode('utf-8')
@@ -148,7 +159,6 @@ def jwt_check(func):
 
     @wraps(func)
     def decorated_func(*args, **kwargs):
-        from modules import database as db
         from flask import request
 
         from modules.response import helper
@@ -163,54 +173,132 @@ def jwt_check(func):
             decoded_token = jwt.decode(token, JWT_SECRET_KEY, verify=True, audience=AppConfig.issuer)
         except jwt.exceptions.InvalidTokenError:
             return helper.response_err(ERR.COMMON.INVALID_SIGNATURE)
-        address, sign_message_id = decoded_token['jti'].split('-')
-
-        # get sign message for calculating hash
-        request.connection = db.engine_rdonly.connect()
-        s3_base_url = 'https://s3.{region}.amazonaws.com'.format(region=s3_policy['profile']['region'])
-        sign_message_query_str = """
-            SELECT 
-              `u`.*, 
-              CONCAT(:s3_base_url, '/', `f`.`bucket`, '/', `f`.`object_key`) AS `profile_image`, 
-              '!sign_message', 
-              `sm`.* 
-            FROM 
-              `users` `u`
-            LEFT JOIN `files` `f`
-              ON (`f`.`file_id` = `u`.`profile_file_id` AND `f`.`type` = :file_type)
-            INNER JOIN `sign_messages` `sm` ON (`u`.`user_id` = `sm`.`user_id`)
-            WHERE `message_id` = :sign_message_id AND `address` = :address
-            LIMIT 1
-        """
-        user_row = request.connection.execute(text(sign_message_query_str),
-                                              file_type='profile',
-                                              address=address,
-                                              s3_base_url=s3_base_url,
-                                              sign_message_id=sign_message_id).fetchone()
-        if user_row is not None:
-            user_row = db.to_relation_model(user_row)
-            user_id = user_row['user_id']
-            sign_message = user_row['sign_message']
-
-            del user_row['sign_message']
-
-            # get hash from decoded JWT
-            decoded_hash = decoded_token['hash']
-
-            # calculate hash from db
-            real_hash = hashlib.md5("{}-{}-{}-{}".format(user_id,
-                                                         sign_message_id,
-                                                         user_row['address'],
-                                                         sign_message['private_key'])
-                                    .encode('utf-8')).hexdigest()
 
+        # get the verified session from cache, or query the sign message for calculating hash
+        session = get_session(decoded_token)
+        if session is not None:
             # if decoded hash is not equal to calculated hash from db, it's invalid token
-            if decoded_hash != real_hash:
+            if decoded_token['hash'] != session['hash']:
                 return helper.response_err(ERR.COMMON.INVALID_SIGNATURE)
 
             # authenticated and inject user information
-            request.user = user_row
+            request.user = session['user']
 
         return func(*args, **kwargs)
 
     return decorated_func
+
+
+def _session_cache_keys(jti, address):
+    from modules.account_address import normalize_address
+    return '/db/session/{}'.format(jti), '/db/session-version/{}'.format(normalize_address(address))
+
+
+def _query_session(address, sign_message_id):
+    """
+    Returns the user information and the hash calculated from the database for the sign message, or None if the sign
+    message does not exist.
+    """
+    s3_base_url = 'https://s3.{region}.amazonaws.com'.format(region=s3_policy['profile']['region'])
+    sign_message_query_str = """
+        SELECT 
+          `u`.*, 
+          CONCAT(:s3_base_url, '/', `f`.`bucket`, '/', `f`.`object_key`) AS `profile_image`, 
+          '!sign_message', 
+          `sm`.* 
+        FROM 
+          `users` `u`
+        LEFT JOIN `files` `f`
+          ON (`f`.`file_id` = `u`.`profile_file_id` AND `f`.`type` = :file_type)
+        INNER JOIN `sign_messages` `sm` ON (`u`.`user_id` = `sm`.`user_id`)
+        WHERE `message_id` = :sign_message_id AND `address` = :address
+        LIMIT 1
+    """
+    with db.engine_rdonly.connect() as connection:
+        user_row = connection.execute(text(sign_message_query_str),
+                                      file_type='profile',
+                                      address=address,
+                                      s3_base_url=s3_base_url,
+                                      sign_message_id=sign_message_id).fetchone()
+
+    if user_row is None:
+        return None
+
+    user_row = db.to_relation_model(user_row)
+    sign_message = user_row['sign_message']
+
+    del user_row['sign_message']
+
+    # calculate hash from db
+    real_hash = hashlib.md5("{}-{}-{}-{}".format(user_row['user_id'],
+                                                 sign_message_id,
+                                                 user_row['address'],
+                                                 sign_message['private_key'])
+                            .encode('utf-8')).hexdigest()
+
+    return {'user': user_row, 'hash': real_hash}
+
+
+def get_session(decoded_token, cache=None):
+    """
+    Returns the session of the decoded JWT token that has the user information and the hash expected from the
+    database.
+
+    {
+      "user": {
+        "user_id": ...,
+        "address": ...,
+        ...
+      },
+      "hash": ...
+    }
+
+    The session is cached by the JWT ID until the token is expired. The cached session is valid only if the session
+    version of the user is the same, so the sessions of the user are invalidated by `expire_sessions`.
+    """
+    import time
+    from config import CacheConfig
+    from modules.cache import MuzikaCache
+
+    cache = cache or MuzikaCache()
+    jti = decoded_token['jti']
+    address, sign_message_id = jti.split('-')
+    session_key, version_key = _session_cache_keys(jti, address)
+
+    session, version = cache().get_many(session_key, version_key)
+    if session is not None and version is not None and session['version'] == version:
+        return session
+
+    session = _query_session(address, sign_message_id)
+    if session is None:
+        return None
+
+    if version is None:
+        version = _new_session_version()
+        if not cache().add(version_key, version, timeout=CacheConfig.session_timeout):
+            # the version is set by other requests at the same time
+            return session
+
+    timeout = min(CacheConfig.session_timeout, int(decoded_token['exp'] - time.time()))
+    if timeout > 0:
+        session['version'] = version
+        cache().set(session_key, session, timeout=timeout)
+
+    return session
+
+
+def _new_session_version():
+    from modules.sign_message import generate_random_sign_message
+    return generate_random_sign_message()
+
+
+def expire_sessions(address, cache=None):
+    """
+    Invalidates all cached sessions of the user. Call it whenever the user signs in again or is modified.
+    """
+    from config import CacheConfig
+    from modules.cache import MuzikaCache
+
+    cache = cache or MuzikaCache()
+    _, version_key = _session_cache_keys('', address)
+    cache().set(version_key, _new_session_version(), timeout=CacheConfig.session_timeout)
@@ -1,11 +1,15 @@
 
 import json
 import os
+import threading
+from collections import OrderedDict
 
 from config import MuzikaContractConfig
 
 __all__ = [
-    'MuzikaContractHandler'
+    'MuzikaContractHandler',
+    'get_contract',
+    'get_contract_factory',
 ]
 
 
@@ -69,6 +73,66 @@ class MuzikaContractHandler:
         return self.get_interface(contract_name)['bytecode']
 
 
+# the contract factories and instances reference their web3 instance, so a cache keyed by the web3 instance would
+# keep it alive. Instead, the caches are attached to the web3 instance and collected together with it.
+_contracts_lock = threading.Lock()
+
+
+class _ContractCache:
+    def __init__(self):
+        # contract factories (parsed ABI), and the bounded LRU cache of contract instances
+        self.factories = {}
+        self.contracts = OrderedDict()
+
+
+def _get_contract_cache(web3):
+    cache = getattr(web3, '_muzika_contract_cache', None)
+    if cache is None:
+        cache = web3._muzika_contract_cache = _ContractCache()
+    return cache
+
+
+def get_contract_factory(web3, contract_name):
+    """
+    Returns a contract factory (class) of the contract. Since creating a factory parses the ABI, the factories are
+    shared in the process for each web3 instance.
+    """
+    with _contracts_lock:
+        factories = _get_contract_cache(web3).factories
+        if contract_name not in factories:
+            factories[contract_name] = MuzikaContractHandler().get_contract(web3, contract_name)
+        return factories[contract_name]
+
+
+def get_contract(web3, contract_name, address=None):
+    """
+    Returns a contract instance at the address. If address is None, returns the contract factory.
+
+    The contract instances are immutable, so they are cached by (contract name, address) for each web3 instance up to
+    `MuzikaContractConfig.contract_cache_size` instances. The web3 instance identifies the provider the contract calls.
+
+    >>> get_contract(web3, 'MuzikaPaperContract', '0x5aAeb6053F3E94C9b9A09f33669435E7Ef1BeAed').functions.seller().call()
+    """
+    if not address:
+        return get_contract_factory(web3, contract_name)
+
+    key = (contract_name, address)
+    with _contracts_lock:
+        contracts = _get_contract_cache(web3).contracts
+        if key in contracts:
+            contracts.move_to_end(key)
+            return contracts[key]
+
+    contract = get_contract_factory(web3, contract_name)(address)
+
+    with _contracts_lock:
+        contracts[key] = contract
+        while len(contracts) > MuzikaContractConfig.contract_cache_size:
+            contracts.popitem(last=False)
+
+    return contract
+
+
 class MuzikaContract(object):
 
     # child class of this class must define contract name
@@ -77,9 +141,8 @@ class MuzikaContract(object):
 
     def __init__(self, web3, *args, **kwargs):
         self.contract_address = kwargs.get('contract_address')
-        contract_handler = MuzikaContractHandler()
         self.web3 = web3
-        self.contract = contract_handler.get_contract(web3, self.__contract_name__, address=self.contract_address)
+        self.contract = get_contract(web3, self.__contract_name__, address=self.contract_address)
 
     def generate(self, *args, **kwargs):
         return self.contract.constructor(*args, **kwargs).transact()
\ No newline at end of file
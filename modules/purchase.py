@@ -0,0 +1,63 @@
+"""
+ Purchase.py
+
+ checks whether a user purchased a paper contract. Since purchases are permanent, it checks the confirmed payments in
+ the database and the cached results before calling the contract in the block chain.
+"""
+
+from config import CacheConfig
+from modules import database as db
+from modules.account_address import normalize_address
+from modules.cache import MuzikaCache
+
+__all__ = [
+    'is_purchased',
+]
+
+
+def _purchased_cache_key(contract_address, buyer_address):
+    return '/chain/purchased/{}/{}'.format(normalize_address(contract_address), normalize_address(buyer_address))
+
+
+def is_purchased(contract_address, buyer_address, web3=None, cache=None):
+    """
+    Returns whether the buyer purchased the paper contract or not.
+
+        1. If the database has a confirmed (success) payment of the buyer for the contract, purchased.
+        2. If the result from the block chain is cached, purchased.
+        3. Call isPurchased of the contract, and cache the result if purchased.
+
+    The database connection is released before calling the contract, so a slow call doesn't hold the connection pool.
+
+    :param contract_address: checksum address of the paper contract.
+    :param buyer_address: checksum address of the buyer.
+    :param web3: web3 instance used only if calling the contract is needed. If None, use the default web3 instance.
+    :param cache: cache instance.
+    :return: True if purchased, nor False.
+    """
+    from modules.contracts.paper_contract import MuzikaPaperContract
+    from modules.web3 import get_web3
+
+    with db.engine_rdonly.connect() as connection:
+        payment = db.statement(db.table.MUSIC_PAYMENTS).columns('payment_id')\
+            .where(contract_address=contract_address, buyer_address=buyer_address, status='success')\
+            .limit(1).select(connection).fetchone()
+
+    if payment is not None:
+        return True
+
+    cache = cache or MuzikaCache()
+    cache_key = _purchased_cache_key(contract_address, buyer_address)
+
+    if cache().get(cache_key):
+        return True
+
+    web3 = web3 or get_web3()
+    contract = MuzikaPaperContract(web3, contract_address=contract_address)
+    purchased = contract.purchased(buyer_address, {'from': buyer_address})
+
+    # only cache if purchased since the buyer can purchase it later
+    if purchased:
+        cache().set(cache_key, True, timeout=CacheConfig.purchased_timeout)
+
+    return purchased
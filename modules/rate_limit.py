@@ -0,0 +1,185 @@
+"""
+ Rate_limit.py
+
+ limits the requests by token buckets. Each bucket is filled with `rate` tokens per second up to `capacity` tokens, and
+ a request consumes a token. If no token left, the request is rejected before doing anything expensive.
+
+ >>> @blueprint.route('/login', methods=['POST'])
+ >>> @rate_limit('login', by_client_ip, by_keys(by_json_field('address'), by_client_ip))
+ >>> def _login():
+ >>>     ...
+
+ The buckets are stored in redis and updated atomically by a lua script, so they are shared by all processes and
+ servers. In local environment, the buckets are stored in the process memory.
+"""
+
+import threading
+import time
+from functools import wraps
+
+from config import CacheConfig, RateLimitConfig
+
+__all__ = [
+    'rate_limit',
+    'by_client_ip',
+    'by_view_arg',
+    'by_json_field',
+    'by_keys',
+    'get_token_bucket',
+]
+
+# consumes tokens from a bucket atomically. Returns 1 if the tokens are consumed, nor 0.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1])
+local ts = tonumber(bucket[2])
+
+if tokens == nil or ts == nil then
+    tokens = capacity
+    ts = now
+end
+
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+
+redis.call('HMSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return allowed
+"""
+
+
+class RedisTokenBucket:
+    """
+    Token buckets stored in redis.
+    """
+
+    def __init__(self):
+        from modules.cache import get_redis
+        self.script = get_redis().register_script(TOKEN_BUCKET_SCRIPT)
+
+    def consume(self, key, rate, capacity, cost=1):
+        key = '{}/rate-limit/{}'.format(CacheConfig.key_prefix, key)
+        return bool(self.script(keys=[key], args=[rate, capacity, time.time(), cost]))
+
+
+class LocalTokenBucket:
+    """
+    Token buckets stored in the process memory. Only for local environment.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def consume(self, key, rate, capacity, cost=1):
+        now = time.time()
+        with self._lock:
+            tokens, ts = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + max(0, now - ts) * rate)
+
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+
+            self._buckets[key] = (tokens, now)
+            return allowed
+
+
+_token_bucket = None
+
+
+def get_token_bucket():
+    global _token_bucket
+    if _token_bucket is None:
+        _token_bucket = RedisTokenBucket() if CacheConfig.cache_type == 'redis' else LocalTokenBucket()
+    return _token_bucket
+
+
+def by_client_ip():
+    """
+    Returns the client IP address. If the server is behind the proxies (ex. ELB), the proxies append the address they
+    received from to X-Forwarded-For header, so the address added by the farthest trusted proxy is the client.
+    """
+    from flask import request
+
+    access_route = request.access_route
+    if request.headers.get('X-Forwarded-For') and RateLimitConfig.trusted_proxies:
+        return 'ip', access_route[-min(RateLimitConfig.trusted_proxies, len(access_route))]
+    return 'ip', request.remote_addr
+
+
+def by_view_arg(name):
+    """
+    Returns a key function with the URL parameter.
+    """
+    def _key():
+        from flask import request
+        from modules.account_address import normalize_address
+        value = (request.view_args or {}).get(name)
+        return name, normalize_address(value) if isinstance(value, str) else None
+    return _key
+
+
+def by_json_field(name):
+    """
+    Returns a key function with the field in JSON body.
+    """
+    def _key():
+        from flask import request
+        from modules.account_address import normalize_address
+        value = (request.get_json(force=True, silent=True) or {}).get(name)
+        return name, normalize_address(value) if isinstance(value, str) else None
+    return _key
+
+
+def by_keys(*key_funcs):
+    """
+    Returns a key function combining the keys. For example, an address is limited per client IP, so a client cannot
+    drain the bucket of the other's address.
+    """
+    def _key():
+        keys = [key_func() for key_func in key_funcs]
+        values = [value for _, value in keys]
+        return '+'.join(name for name, _ in keys), None if None in values else '/'.join(values)
+    return _key
+
+
+def rate_limit(limit_name, *key_funcs):
+    """
+    Rejects the request if any of the buckets has no token. The buckets are defined by the limit name and the keys
+    from key functions, and their rate and capacity are configured in RateLimitConfig.limits.
+    """
+    def decorator(func):
+        @wraps(func)
+        def decorated_func(*args, **kwargs):
+            from modules.response import helper
+            from modules.response.error import ERR
+
+            if RateLimitConfig.enabled:
+                bucket = get_token_bucket()
+                for key_func in key_funcs:
+                    key_name, key = key_func()
+
+                    # if the key doesn't exist (ex. no address in the request), the handler will reject it anyway.
+                    if key is None:
+                        continue
+
+                    rate, capacity = RateLimitConfig.limits[limit_name][key_name]
+                    if not bucket.consume('{}/{}/{}'.format(limit_name, key_name, key), rate, capacity):
+                        return helper.response_err(ERR.COMMON.TOO_MANY_REQUEST)
+
+            return func(*args, **kwargs)
+
+        return decorated_func
+
+    return decorator
@@ -21,13 +21,17 @@ __all__ = [
 ]
 
 
-def validate_signature(web3, address, sig_obj, protocol='eth'):
+def validate_signature(web3, address, sig_obj, protocol='eth', recovery_backend=None):
     """
     Validate the signature by signature object.
 
     It calculates the wallet address from the message hash and signature
     and check validation by comparing it with original address.
+
+    The web3 parameter is not used anymore since the address is recovered by modules/ecrecover.py. If recovery
+    backend is None, use the backend configured in config.py.
     """
+    from modules.ecrecover import recover_address as recover
     from modules.sign_message import construct_sign_message
 
     try:
@@ -38,36 +42,22 @@ def validate_signature(web3, address, sig_obj, protocol='eth'):
 
         if protocol == 'eth':
             message_hash = construct_sign_message(purpose, message, version)
-            # recover address from hash and signature
-            recover_address = web3.eth.account.recoverHash(message_hash, signature=signature)
+            # recover address from hash and signature. It doesn't need any web3 provider since computed locally.
+            recover_address = recover(message_hash, signature, backend=recovery_backend)
             # if equal to address, it's valid signature.
             return recover_address.lower() == address.lower()
 
         elif protocol == 'ont':
-            import ecdsa
-            from modules.ecc import uncompress_public_key
-            from hashlib import sha3_256
-
-            public_key = bytearray.fromhex(signature['publicKey'])
+            from modules.ecc import verify_signature
 
-            # checks the public key compressed or not. If compressed, uncompress before verification.
-            if public_key.startswith(b'\x02') or public_key.startswith(b'\x03'):
-                public_key = uncompress_public_key(public_key)
-            elif public_key.startswith(b'\x04'):
-                pass
-            else:
-                raise ValueError('Invalid public key format')
+            public_key = bytes.fromhex(signature['publicKey'])
 
             # verify the signature. The message hashing algorithm is sha3-256.
-            vk = ecdsa.VerifyingKey.from_string(public_key, curve=ecdsa.NIST256p)
             message = '{}\nSignature: {}'.format(purpose, message)
-            sig = bytearray.fromhex(signature['data'][2:])
-            return vk.verify(sig, message.encode(), hashfunc=sha3_256)
+            sig = bytes.fromhex(signature['data'][2:])
+            return verify_signature(public_key, sig, message.encode())
     except TypeError as e:
         # if unsupported signature version or invalid variable format, fail to validate
         return False
     except ValueError as e:
         return False
-    except ecdsa.keys.BadSignatureError as e:
-        # if invalid signature
-        return False
@@ -0,0 +1,158 @@
+"""
+ Task_schedule.py
+
+ runs the periodic tasks without overlapping, and backs off the interval of the tasks when they have nothing to do.
+
+ >>> run_task('update_contracts', update_contracts, adaptive=True)
+
+    - lock: the task is skipped if the same task is running in any worker. The lock expires after
+      TaskScheduleConfig.lock_timeout even if the worker died.
+    - backoff: if the task returns a falsy value (nothing to do), the interval to the next run is multiplied by
+      backoff_factor up to max_interval. If it returns a truthy value, the interval is reset to min_interval.
+    - wake: when a new contract or payment is submitted, call `wake_task` to run the task at the next beat.
+
+ The locks and the schedules are stored in redis, so they are shared by all workers. In local environment, they are
+ stored in the process memory.
+"""
+
+import threading
+import time
+import uuid
+
+from config import CacheConfig, TaskScheduleConfig
+
+__all__ = [
+    'run_task',
+    'wake_task',
+    'get_task_schedule',
+]
+
+# deletes the lock only if the lock is owned by the token
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisTaskSchedule:
+    """
+    Task locks and schedules stored in redis.
+    """
+
+    def __init__(self):
+        from modules.cache import get_redis
+        self.redis = get_redis()
+        self.release_script = self.redis.register_script(RELEASE_LOCK_SCRIPT)
+
+    @staticmethod
+    def _key(kind, name):
+        return '{}/task-{}/{}'.format(CacheConfig.key_prefix, kind, name)
+
+    def acquire(self, name, timeout):
+        token = uuid.uuid4().hex
+        if self.redis.set(self._key('lock', name), token, nx=True, px=int(timeout * 1000)):
+            return token
+        return None
+
+    def release(self, name, token):
+        self.release_script(keys=[self._key('lock', name)], args=[token])
+
+    def get(self, name):
+        """
+        Returns (interval, next run time) of the task.
+        """
+        schedule = self.redis.hmget(self._key('schedule', name), 'interval', 'next_run')
+        interval = float(schedule[0]) if schedule[0] is not None else TaskScheduleConfig.min_interval
+        next_run = float(schedule[1]) if schedule[1] is not None else 0
+        return interval, next_run
+
+    def set(self, name, interval, next_run):
+        self.redis.hmset(self._key('schedule', name), {'interval': interval, 'next_run': next_run})
+
+
+class LocalTaskSchedule:
+    """
+    Task locks and schedules stored in the process memory. Only for local environment.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._locks = {}
+        self._schedules = {}
+
+    def acquire(self, name, timeout):
+        now = time.time()
+        with self._lock:
+            token, expires_at = self._locks.get(name, (None, 0))
+            if token is not None and expires_at > now:
+                return None
+            token = uuid.uuid4().hex
+            self._locks[name] = (token, now + timeout)
+            return token
+
+    def release(self, name, token):
+        with self._lock:
+            if self._locks.get(name, (None, 0))[0] == token:
+                del self._locks[name]
+
+    def get(self, name):
+        with self._lock:
+            return self._schedules.get(name, (TaskScheduleConfig.min_interval, 0))
+
+    def set(self, name, interval, next_run):
+        with self._lock:
+            self._schedules[name] = (interval, next_run)
+
+
+_task_schedule = None
+
+
+def get_task_schedule():
+    global _task_schedule
+    if _task_schedule is None:
+        _task_schedule = RedisTaskSchedule() if CacheConfig.cache_type == 'redis' else LocalTaskSchedule()
+    return _task_schedule
+
+
+def run_task(name, func, adaptive=False):
+    """
+    Runs the function if the same task is not running. If adaptive, it also runs only if the task is due.
+
+    Returns the result of the function, or a dict with the reason if skipped.
+    """
+    schedule = get_task_schedule()
+
+    if adaptive:
+        # the beat may come a little before the next run time, so allow the half of the beat period
+        _, next_run = schedule.get(name)
+        if next_run > time.time() + TaskScheduleConfig.min_interval / 2:
+            return {'skipped': 'backoff'}
+
+    token = schedule.acquire(name, TaskScheduleConfig.lock_timeout)
+    if token is None:
+        return {'skipped': 'running'}
+
+    try:
+        result = func()
+    finally:
+        schedule.release(name, token)
+
+    if adaptive:
+        # if woken while running, don't back off
+        interval, next_run = schedule.get(name)
+        if result or next_run == 0:
+            interval = TaskScheduleConfig.min_interval
+        else:
+            interval = min(interval * TaskScheduleConfig.backoff_factor, TaskScheduleConfig.max_interval)
+        schedule.set(name, interval, time.time() + interval)
+
+    return result
+
+
+def wake_task(name):
+    """
+    Resets the interval of the task, so it runs at the next beat. Call it when the task has a new thing to do.
+    """
+    get_task_schedule().set(name, TaskScheduleConfig.min_interval, 0)
@@ -0,0 +1,62 @@
+
+from sqlalchemy import text
+
+from modules import database as db
+from modules.account_address import normalize_address
+from modules.secret import load_secret_json
+
+s3_policy = load_secret_json('aws')['s3']
+
+
+def _user_profile_cache_key(address):
+    return '/db/user/{}'.format(normalize_address(address))
+
+
+def get_user_profile(connection, address, cache=None):
+    """
+    Returns an user information by wallet address, or None if the user does not exist.
+
+    The result is cached by the address. Since clients and crawlers query the addresses that are not registered yet,
+    not existing addresses are also cached for a short time.
+    """
+    from config import CacheConfig
+    from modules.cache import MuzikaCache
+
+    cache = cache or MuzikaCache()
+    cache_key = _user_profile_cache_key(address)
+    cached = cache().get(cache_key)
+
+    if cached is not None:
+        return cached['user']
+
+    s3_base_url = 'https://s3.{region}.amazonaws.com'.format(region=s3_policy['profile']['region'])
+
+    user_query_stmt = """
+        SELECT `u`.*, CONCAT(:s3_base_url, '/', `f`.`bucket`, '/', `f`.`object_key`) AS `profile_image` FROM `{}` `u`
+        LEFT JOIN `{}` `f`
+          ON (`f`.`file_id` = `u`.`profile_file_id` AND `f`.`type` = :file_type)
+        WHERE `u`.`address` = :address
+        LIMIT 1
+    """.format(db.table.USERS, db.table.FILES)
+
+    user = db.to_relation_model(connection.execute(
+        text(user_query_stmt),
+        s3_base_url=s3_base_url,
+        address=address,
+        file_type='profile'
+    ).fetchone())
+
+    cache().set(cache_key, {'user': user},
+                timeout=CacheConfig.user_profile_timeout if user else CacheConfig.user_not_found_timeout)
+
+    return user
+
+
+def expire_user_profile(address, cache=None):
+    """
+    Removes the cached user information. Call it whenever the user is created or modified.
+    """
+    from modules.cache import MuzikaCache
+
+    cache = cache or MuzikaCache()
+    cache().delete(_user_profile_cache_key(address))
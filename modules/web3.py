@@ -1,29 +1,113 @@
 
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
 from web3 import Web3
+from web3.eth import Eth
+from web3.main import get_default_modules
 
 from config import Web3ProviderConfig
 
+# web3 instance shared by all threads in this process
+_web3 = None
+_web3_pid = None
+_web3_lock = threading.Lock()
+
+# HTTP session that keeps connections alive to the endpoint
+_session = None
+
+
+class FailoverHTTPProvider(Web3.HTTPProvider):
+    """
+    HTTP provider that sends JSON-RPC requests to the endpoint pool (see modules/endpoint_pool.py), so the requests
+    are failed over to the other endpoints and the read requests are hedged.
+    """
+
+    def __init__(self, pool=None):
+        from modules.endpoint_pool import get_endpoint_pool
+        self.pool = pool or get_endpoint_pool()
+        super(FailoverHTTPProvider, self).__init__(self.pool.endpoints[0].url)
+
+    def make_request(self, method, params):
+        from modules.endpoint_pool import READ_METHODS
+        request_data = self.encode_rpc_request(method, params)
+        return self.decode_rpc_response(self.pool.request(request_data, read_only=method in READ_METHODS))
+
+
+class LazyAccountEth(Eth):
+    """
+    Eth module that resolves the default account by `eth_accounts` only when it is needed (ex. sending transactions),
+    not when the web3 instance is created.
+    """
+    _default_account = None
+
+    @property
+    def defaultAccount(self):
+        if self._default_account is None:
+            accounts = self.accounts
+            self._default_account = accounts[0] if accounts else ''
+        return self._default_account or None
+
+    @defaultAccount.setter
+    def defaultAccount(self, account):
+        self._default_account = account
+
+
+def get_default_session():
+    """
+    :return: requests session shared by the default providers (connection pool size from config.py)
+    """
+    global _session
+    if _session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max(Web3ProviderConfig.pool_connections,
+                                                   len(Web3ProviderConfig.endpoint_urls)),
+                              pool_maxsize=Web3ProviderConfig.pool_maxsize)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _session = session
+    return _session
+
 
 def get_default_provider():
     """
-    :return: default HTTPProvider (endpoint url from config.py)
+    :return: default HTTPProvider (endpoint urls from config.py)
+    """
+    return FailoverHTTPProvider()
+
+
+def create_web3(provider, default_account=None):
+    """
+    Returns a new web3 instance. If default account is None, it is resolved when it is used for the first time.
     """
-    return Web3.HTTPProvider(
-        Web3ProviderConfig.endpoint_url,
-        request_kwargs={
-            'timeout': Web3ProviderConfig.timeout
-        }
-    )
+    modules = get_default_modules()
+    modules.update({'eth': LazyAccountEth})
+    web3 = Web3(provider, modules=modules)
+    if default_account is not None:
+        web3.eth.defaultAccount = default_account
+    return web3
 
 
 def get_web3(provider=None, default_account=None):
     """
     Returns web3 instance for backend interacting with block chain network. If not setting provider parameter, bring
     configuration from config.py.
+
+    If no parameters, the web3 instance is shared in the process, so don't change its default account.
     """
-    web3 = Web3(provider) if provider else Web3(get_default_provider())
-    if default_account is None and web3.eth.accounts:
-        default_account = web3.eth.accounts[0]
-    web3.eth.defaultAccount = default_account
-    return web3
+    global _web3, _web3_pid, _session
+
+    if provider is not None or default_account is not None:
+        return create_web3(provider or get_default_provider(), default_account)
+
+    # the instance is not shared with the forked processes (ex. celery workers)
+    if _web3 is None or _web3_pid != os.getpid():
+        with _web3_lock:
+            if _web3 is None or _web3_pid != os.getpid():
+                _session = None
+                _web3 = create_web3(get_default_provider())
+                _web3_pid = os.getpid()
 
+    return _web3
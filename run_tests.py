@@ -2,7 +2,8 @@ import os
 import sys
 import unittest
 
-from tests import test_db_stmt
+from tests import test_db_stmt, test_cache_metrics, test_account_address, test_ecc, test_rate_limit, \
+    test_endpoint_pool, test_task_schedule, test_ipfs_crawl
 
 # initialize the test suite
 loader = unittest.TestLoader()
@@ -10,6 +11,13 @@ suite = unittest.TestSuite()
 
 # add tests to the test suite
 suite.addTests(loader.loadTestsFromModule(test_db_stmt))
+suite.addTests(loader.loadTestsFromModule(test_cache_metrics))
+suite.addTests(loader.loadTestsFromModule(test_account_address))
+suite.addTests(loader.loadTestsFromModule(test_ecc))
+suite.addTests(loader.loadTestsFromModule(test_rate_limit))
+suite.addTests(loader.loadTestsFromModule(test_endpoint_pool))
+suite.addTests(loader.loadTestsFromModule(test_task_schedule))
+suite.addTests(loader.loadTestsFromModule(test_ipfs_crawl))
 
 if __name__ == '__main__':
     # initialize a runner, pass it your suite and run it
@@ -0,0 +1,81 @@
+
+"""
+ This script measures the throughput of the signature validation for signing in.
+
+ It compares the recovery backends (modules/ecrecover.py) with the ethereum signature (version 1) and Trezor signature
+ (version 2) made by `construct_sign_message`.
+
+ > python scripts/benchmark_signature.py -n 1000
+"""
+
+import argparse
+import os
+import time
+
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from eth_keys import keys
+
+from modules.ecrecover import RECOVERY_BACKENDS, get_recovery_backend
+from modules.sign_message import construct_sign_message, generate_random_sign_message
+from modules.signature import validate_signature
+
+SIGN_PURPOSE = 'Login to Muzika!'
+
+
+def generate_signatures(count, version):
+    """
+    Returns signature objects signed by random private keys with the addresses.
+    """
+    signatures = []
+    for _ in range(count):
+        private_key = keys.PrivateKey(os.urandom(32))
+        message = generate_random_sign_message()
+        message_hash = construct_sign_message(SIGN_PURPOSE, message, version)
+
+        # wallets make v value 27 or 28
+        signature = bytearray(private_key.sign_msg_hash(bytes(message_hash)).to_bytes())
+        signature[64] += 27
+
+        signatures.append((private_key.public_key.to_checksum_address(), {
+            'purpose': SIGN_PURPOSE,
+            'message': message,
+            'signature': '0x' + signature.hex(),
+            'signature_version': version
+        }))
+    return signatures
+
+
+def benchmark(backend, signatures):
+    start = time.perf_counter()
+    for address, sig_obj in signatures:
+        if not validate_signature(None, address, sig_obj, recovery_backend=backend):
+            raise AssertionError('failed to validate a signature with {} backend'.format(backend))
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    args = argparse.ArgumentParser()
+    args.add_argument('-n', '--iterations', help='the number of signatures for each version', type=int, default=1000)
+    args.add_argument('-b', '--backend', help='recovery backends to compare', action='append',
+                      choices=list(RECOVERY_BACKENDS.keys()))
+    args = args.parse_args()
+
+    backends = args.backend or list(RECOVERY_BACKENDS.keys())
+    signatures = {
+        1: generate_signatures(args.iterations, 1),
+        2: generate_signatures(args.iterations, 2),
+    }
+
+    print('{:<12} {:<8} {:>12} {:>14}'.format('backend', 'version', 'total (s)', 'validations/s'))
+    for backend in backends:
+        try:
+            get_recovery_backend(backend)
+        except ImportError:
+            print('{:<12} not available'.format(backend))
+            continue
+
+        for version, version_signatures in signatures.items():
+            elapsed = benchmark(backend, version_signatures)
+            print('{:<12} {:<8} {:>12.4f} {:>14.1f}'.format(backend, version, elapsed, len(version_signatures) / elapsed))
@@ -0,0 +1,401 @@
+
+"""
+ This script measures the throughput of the block chain jobs (works/) without Infura.
+
+ It runs the jobs against a local in-process JSON-RPC stand-in of the ethereum network, seeded with synthetic
+ MuzikaPaperContract deployments and Purchase events, and a MySQL test database. For each tick of the jobs, it reports
+ wall time, HTTP requests and JSON-RPC calls to the chain, and SQL statements.
+
+ The database must be a dedicated database for benchmark (its name must contain 'test' or 'bench') since the tables
+ used by the jobs are dropped and created with only the columns the jobs use. The contract build files
+ (MuzikaContractConfig.build_path) are needed to make the contract creation transactions.
+
+ > python scripts/benchmark_works.py --database-url mysql+pymysql://root@localhost/muzika_bench -c 1000 -p 1000
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from eth_abi import encode_abi
+from eth_utils import encode_hex, keccak, to_checksum_address
+from sqlalchemy import create_engine, event, text
+
+from config import MuzikaContractConfig, Web3ProviderConfig
+from modules import database as db
+from modules.cache import MuzikaCache
+from modules.checkpoint import set_checkpoint
+from modules.muzika_contract import MuzikaContractHandler
+from works.index_payments import CHECKPOINT_NAME as INDEX_CHECKPOINT_NAME
+
+PURCHASE_EVENT_TOPIC = encode_hex(keccak(text='Purchase(address,uint256)'))
+SELLER_SELECTOR = encode_hex(keccak(text='seller()')[:4])
+
+JOBS = ['update_contracts', 'update_payments', 'index_payments']
+
+# tables with only the columns used by the jobs
+TABLE_SCHEMAS = [
+    """
+    CREATE TABLE `{}` (
+      `user_id` INT NOT NULL AUTO_INCREMENT,
+      `address` VARCHAR(64) NOT NULL,
+      PRIMARY KEY (`user_id`),
+      UNIQUE KEY (`address`)
+    )
+    """.format(db.table.USERS),
+    """
+    CREATE TABLE `{}` (
+      `post_id` INT NOT NULL AUTO_INCREMENT,
+      `user_id` INT NOT NULL,
+      `status` VARCHAR(16) NOT NULL DEFAULT 'posted',
+      PRIMARY KEY (`post_id`)
+    )
+    """.format(db.table.board('music')),
+    """
+    CREATE TABLE `{}` (
+      `contract_id` INT NOT NULL AUTO_INCREMENT,
+      `post_id` INT,
+      `tx_hash` VARCHAR(80) NOT NULL,
+      `contract_address` VARCHAR(64),
+      `seller_address` VARCHAR(64),
+      `status` VARCHAR(16) NOT NULL DEFAULT 'pending',
+      `created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+      PRIMARY KEY (`contract_id`),
+      KEY (`status`),
+      KEY (`contract_address`)
+    )
+    """.format(db.table.MUSIC_CONTRACTS),
+    """
+    CREATE TABLE `{}` (
+      `payment_id` INT NOT NULL AUTO_INCREMENT,
+      `tx_hash` VARCHAR(80) NOT NULL,
+      `buyer_address` VARCHAR(64),
+      `contract_address` VARCHAR(64),
+      `price` VARCHAR(80),
+      `status` VARCHAR(16) NOT NULL DEFAULT 'pending',
+      `created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+      PRIMARY KEY (`payment_id`),
+      KEY (`status`),
+      KEY (`tx_hash`)
+    )
+    """.format(db.table.MUSIC_PAYMENTS),
+    """
+    CREATE TABLE `{}` (
+      `name` VARCHAR(64) NOT NULL,
+      `block_number` BIGINT UNSIGNED NOT NULL,
+      `updated_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+      PRIMARY KEY (`name`)
+    )
+    """.format(db.table.CHAIN_CHECKPOINTS),
+]
+
+
+def random_hex(length):
+    return '0x' + os.urandom(length).hex()
+
+
+class StandInChain:
+    """
+    Synthetic chain state that answers the JSON-RPC calls used by the jobs.
+    """
+
+    def __init__(self, contract_count, payment_count):
+        contract_handler = MuzikaContractHandler()
+        dispatcher = contract_handler.get_interface('Dispatcher')
+        self.network, deployment = next(iter(dispatcher['networks'].items()))
+
+        # contract creation input is the linked bytecode with the different metadata
+        bytecode = contract_handler.get_bytecode('MuzikaPaperContract')[:-68].replace(
+            '__LibPaperPaymentInterface______________', deployment['address'][2:]
+        )
+
+        self.contracts = {}
+        self.payments = {}
+
+        for index in range(contract_count):
+            self.contracts[random_hex(32)] = {
+                'address': to_checksum_address(random_hex(20)),
+                'seller': to_checksum_address(random_hex(20)),
+                'input': bytecode + os.urandom(34).hex(),
+                'block_number': 1 + index // 100,
+            }
+
+        contract_addresses = [contract['address'] for contract in self.contracts.values()]
+        for index in range(payment_count):
+            self.payments[random_hex(32)] = {
+                'contract_address': contract_addresses[index % len(contract_addresses)],
+                'buyer': to_checksum_address(random_hex(20)),
+                'price': '0x' + encode_abi(['uint256'], [10 ** 18]).hex(),
+                'block_number': 1 + index // 100,
+            }
+
+        self.sellers = {contract['address'].lower(): contract['seller'] for contract in self.contracts.values()}
+
+        # all blocks have enough confirmations
+        last_block = max([item['block_number'] for item in list(self.contracts.values()) +
+                          list(self.payments.values())] or [1])
+        self.block_number = last_block + MuzikaContractConfig.confirmations + 1
+
+        self.http_requests = 0
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def handle(self, request):
+        with self._lock:
+            self.calls[request['method']] += 1
+        result = getattr(self, request['method'])(*request['params'])
+        return {'jsonrpc': '2.0', 'id': request['id'], 'result': result}
+
+    def _purchase_log(self, tx_hash, payment):
+        return {
+            'address': payment['contract_address'],
+            'topics': [PURCHASE_EVENT_TOPIC, '0x' + '00' * 12 + payment['buyer'][2:].lower()],
+            'data': payment['price'],
+            'blockNumber': hex(payment['block_number']),
+            'blockHash': '0x' + '00' * 32,
+            'transactionHash': tx_hash,
+            'transactionIndex': '0x0',
+            'logIndex': '0x0',
+        }
+
+    def net_version(self):
+        return self.network
+
+    def eth_blockNumber(self):
+        return hex(self.block_number)
+
+    def eth_getTransactionReceipt(self, tx_hash):
+        receipt = {
+            'transactionHash': tx_hash,
+            'blockHash': '0x' + '00' * 32,
+            'transactionIndex': '0x0',
+            'cumulativeGasUsed': '0x0',
+            'gasUsed': '0x0',
+            'status': '0x1',
+            'logsBloom': '0x' + '00' * 256,
+            'contractAddress': None,
+            'logs': [],
+        }
+
+        if tx_hash in self.contracts:
+            contract = self.contracts[tx_hash]
+            receipt.update({'blockNumber': hex(contract['block_number']), 'contractAddress': contract['address']})
+        elif tx_hash in self.payments:
+            payment = self.payments[tx_hash]
+            receipt.update({'blockNumber': hex(payment['block_number']),
+                            'logs': [self._purchase_log(tx_hash, payment)]})
+        else:
+            return None
+
+        return receipt
+
+    def eth_getTransactionByHash(self, tx_hash):
+        contract = self.contracts.get(tx_hash)
+        if contract is None:
+            return None
+
+        return {
+            'hash': tx_hash,
+            'blockNumber': hex(contract['block_number']),
+            'from': contract['seller'],
+            'to': None,
+            'input': contract['input'],
+            'value': '0x0',
+            'gas': '0x0',
+            'gasPrice': '0x0',
+            'nonce': '0x0',
+        }
+
+    def eth_call(self, transaction, block_identifier='latest'):
+        seller = self.sellers.get(transaction['to'].lower())
+        if seller is None or not transaction['data'].startswith(SELLER_SELECTOR):
+            return '0x'
+        return '0x' + encode_abi(['address'], [seller]).hex()
+
+    def eth_getLogs(self, log_filter):
+        from_block, to_block = int(log_filter['fromBlock'], 16), int(log_filter['toBlock'], 16)
+        return [self._purchase_log(tx_hash, payment) for tx_hash, payment in self.payments.items()
+                if from_block <= payment['block_number'] <= to_block]
+
+
+class StandInServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, chain):
+        server = self
+        self.chain = chain
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8'))
+                with chain._lock:
+                    chain.http_requests += 1
+
+                if isinstance(payload, list):
+                    response = [chain.handle(request) for request in payload]
+                else:
+                    response = chain.handle(payload)
+
+                body = json.dumps(response).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        super(StandInServer, self).__init__(('127.0.0.1', 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self.server_address[1])
+
+
+def create_tables(engine):
+    with engine.connect() as connection:
+        for schema in TABLE_SCHEMAS:
+            table_name = schema.split('`')[1]
+            connection.execute('DROP TABLE IF EXISTS `{}`'.format(table_name))
+            connection.execute(schema)
+
+
+def seed(engine, chain):
+    """
+    Inserts the pending contracts and payments of the synthetic chain, and removes the checkpoints and cache.
+    """
+    with engine.connect() as connection:
+        for table_name in [db.table.USERS, db.table.board('music'), db.table.MUSIC_CONTRACTS,
+                           db.table.MUSIC_PAYMENTS, db.table.CHAIN_CHECKPOINTS]:
+            connection.execute('TRUNCATE TABLE `{}`'.format(table_name))
+
+        contracts = list(chain.contracts.items())
+        if not contracts:
+            return
+
+        connection.execute(text('INSERT INTO `{}` (`user_id`, `address`) VALUES (:user_id, :address)'
+                                .format(db.table.USERS)),
+                           *[{'user_id': index + 1, 'address': contract['seller']}
+                             for index, (_, contract) in enumerate(contracts)])
+        connection.execute(text('INSERT INTO `{}` (`post_id`, `user_id`) VALUES (:post_id, :user_id)'
+                                .format(db.table.board('music'))),
+                           *[{'post_id': index + 1, 'user_id': index + 1} for index in range(len(contracts))])
+        connection.execute(text('INSERT INTO `{}` (`post_id`, `tx_hash`) VALUES (:post_id, :tx_hash)'
+                                .format(db.table.MUSIC_CONTRACTS)),
+                           *[{'post_id': index + 1, 'tx_hash': tx_hash}
+                             for index, (tx_hash, _) in enumerate(contracts)])
+
+    MuzikaCache()().clear()
+
+
+def confirm_contracts(engine, chain):
+    """
+    Marks all contracts as success, so the payments for them are valid.
+    """
+    if not chain.contracts:
+        return
+
+    with engine.connect() as connection:
+        connection.execute(text('UPDATE `{}` SET `status` = \'success\', `contract_address` = :contract_address '
+                                'WHERE `tx_hash` = :tx_hash'.format(db.table.MUSIC_CONTRACTS)),
+                           *[{'tx_hash': tx_hash, 'contract_address': contract['address']}
+                             for tx_hash, contract in chain.contracts.items()])
+
+
+def seed_payments(engine, chain, indexed=False):
+    with engine.connect() as connection:
+        connection.execute('TRUNCATE TABLE `{}`'.format(db.table.MUSIC_PAYMENTS))
+        connection.execute('TRUNCATE TABLE `{}`'.format(db.table.CHAIN_CHECKPOINTS))
+        if chain.payments:
+            connection.execute(text('INSERT INTO `{}` (`tx_hash`, `created_at`) '
+                                    'VALUES (:tx_hash, NOW() - INTERVAL :created_before SECOND)'
+                                    .format(db.table.MUSIC_PAYMENTS)),
+                               *[{'tx_hash': tx_hash, 'created_before': MuzikaContractConfig.payment_check_delay + 60}
+                                 for tx_hash in chain.payments.keys()])
+
+        # update_payments only checks the payments older than payment_check_delay in the blocks index_payments passed
+        if indexed:
+            set_checkpoint(connection, INDEX_CHECKPOINT_NAME, chain.block_number - MuzikaContractConfig.confirmations)
+
+    MuzikaCache()().clear()
+
+
+def run_job(job_name):
+    if job_name == 'update_contracts':
+        from works.update_contracts import update_contracts
+        update_contracts()
+    elif job_name == 'update_payments':
+        from works.update_payments import update_payments
+        update_payments()
+    elif job_name == 'index_payments':
+        from works.index_payments import index_payments
+        index_payments()
+
+
+def count_statements(engine):
+    counter = Counter()
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        counter['statements'] += 1
+        counter['rows'] += len(parameters) if executemany else 1
+
+    return counter
+
+
+if __name__ == '__main__':
+    args = argparse.ArgumentParser()
+    args.add_argument('--database-url', help='SQLAlchemy URL of the benchmark database', required=True)
+    args.add_argument('-c', '--contracts', help='the number of contract deployments', type=int, default=1000)
+    args.add_argument('-p', '--payments', help='the number of purchases', type=int, default=1000)
+    args.add_argument('-t', '--ticks', help='the number of ticks for each job', type=int, default=2)
+    args.add_argument('-j', '--job', help='jobs to run', action='append', choices=JOBS)
+    args = args.parse_args()
+
+    engine = create_engine(args.database_url, encoding='utf-8')
+    if 'test' not in engine.url.database and 'bench' not in engine.url.database:
+        raise SystemExit('The database name must contain "test" or "bench" since its tables are dropped.')
+
+    chain = StandInChain(args.contracts, args.payments)
+    server = StandInServer(chain)
+
+    # the jobs use the stand-in chain and the benchmark database
+    Web3ProviderConfig.endpoint_urls = [server.url]
+    Web3ProviderConfig.endpoint_url = server.url
+    db.engine_rdwr = db.engine_rdonly = engine
+    statements = count_statements(engine)
+
+    create_tables(engine)
+    seed(engine, chain)
+
+    print('{:<18} {:>5} {:>10} {:>10} {:>10} {:>12} {:>10}'.format(
+        'job', 'tick', 'time (s)', 'http', 'rpc calls', 'statements', 'rows'))
+
+    for job_name in args.job or JOBS:
+        if job_name != 'update_contracts':
+            confirm_contracts(engine, chain)
+            seed_payments(engine, chain, indexed=job_name == 'update_payments')
+
+        for tick in range(1, args.ticks + 1):
+            http_requests, calls = chain.http_requests, sum(chain.calls.values())
+            statements.clear()
+
+            start = time.perf_counter()
+            run_job(job_name)
+            elapsed = time.perf_counter() - start
+
+            print('{:<18} {:>5} {:>10.3f} {:>10} {:>10} {:>12} {:>10}'.format(
+                job_name, tick, elapsed, chain.http_requests - http_requests, sum(chain.calls.values()) - calls,
+                statements['statements'], statements['rows']))
+
+    server.shutdown()
@@ -0,0 +1,39 @@
+
+"""
+ This script starts a celery worker that consumes a queue with the options of the queue in CeleryConfig.queues.
+
+ The worker is named `<queue>@<host>`, and the other arguments are passed to celery.
+
+ > python scripts/celery_worker.py ipfs --loglevel=INFO
+ > python scripts/celery_worker.py chain --loglevel=INFO
+
+ The periodic tasks are sent by celery beat, which runs separately.
+
+ > celery beat -A tasks --loglevel=INFO
+"""
+
+import os
+
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from config import CeleryConfig
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] not in CeleryConfig.queues:
+        print('Usage: python {} ({}) [celery options]'.format(sys.argv[0], '|'.join(CeleryConfig.queues.keys())))
+        sys.exit(os.EX_USAGE)
+
+    queue_name = sys.argv[1]
+    queue = CeleryConfig.queues[queue_name]
+
+    # use celery in the same environment (ex. virtualenv) with this python
+    celery = os.path.join(os.path.dirname(sys.executable), 'celery')
+    os.execv(celery, [
+        celery, 'worker',
+        '-A', 'tasks',
+        '-n', '{}@%h'.format(queue_name),
+        '-Q', queue_name,
+        '--concurrency', str(queue['concurrency']),
+        '--prefetch-multiplier', str(queue['prefetch_multiplier']),
+    ] + sys.argv[2:])
@@ -1,6 +1,7 @@
 
 import os
 from celery import Celery
+from config import CeleryConfig
 from modules import database as db
 
 if os.environ.get('ENV') in ['production', 'stage']:
@@ -12,15 +13,32 @@ else:
     # In local, use sqlite for convenient. It has to be used only in local environment.
     app = Celery('tasks', backend='db+sqlite:///celery.sqlite', broker='sqla+sqlite:///celery.sqlite')
 
+# route the tasks to their queues, and apply the time limits of the queues
+app.conf.task_routes = {task_name: {'queue': queue} for task_name, queue in CeleryConfig.routes.items()}
+app.conf.task_default_queue = 'maintenance'
+app.conf.task_annotations = {
+    task_name: {
+        'soft_time_limit': CeleryConfig.queues[queue]['soft_time_limit'],
+        'time_limit': CeleryConfig.queues[queue]['time_limit'],
+    } for task_name, queue in CeleryConfig.routes.items()
+}
+
 
 @app.on_after_configure.connect
 def setup_periodic_tasks(sender, **kwargs):
     """
     Registers periodical tasks.
     """
-    from config import MuzikaContractConfig
-    sender.add_periodic_task(MuzikaContractConfig.update_period, update_contracts.s(), name='update_contracts')
-    sender.add_periodic_task(MuzikaContractConfig.update_period, update_payments.s(), name='update_payments')
+    from config import IPFSConfig, MuzikaContractConfig, SignMessageConfig
+    # if the chain listener triggers the tasks by new blocks, polling is only a fallback
+    update_period = MuzikaContractConfig.fallback_update_period if MuzikaContractConfig.listener_enabled \
+        else MuzikaContractConfig.update_period
+
+    sender.add_periodic_task(update_period, update_contracts.s(), name='update_contracts')
+    sender.add_periodic_task(update_period, update_payments.s(), name='update_payments')
+    sender.add_periodic_task(update_period, index_payments.s(), name='index_payments')
+    sender.add_periodic_task(SignMessageConfig.prune_period, prune_sign_messages.s(), name='prune_sign_messages')
+    sender.add_periodic_task(IPFSConfig.track_period, track_ipfs_files.s(), name='track_ipfs_files')
 
 
 @app.task(bind=True, max_retries=3)
@@ -31,13 +49,35 @@ def update_contract_files(self, ipfs_file_id, contract_id):
         translate_contract(connection, contract_id)
 
 
+@app.task(bind=True)
+def track_ipfs_files(self):
+    from modules.task_schedule import run_task
+    from works.track_ipfs_files import track_ipfs_files
+    return run_task('track_ipfs_files', track_ipfs_files)
+
+
 @app.task(bind=True)
 def update_contracts(self):
+    from modules.task_schedule import run_task
     from works.update_contracts import update_contracts
-    update_contracts()
+    return run_task('update_contracts', update_contracts, adaptive=True)
 
 
 @app.task(bind=True)
 def update_payments(self):
+    from modules.task_schedule import run_task
     from works.update_payments import update_payments
-    update_payments()
\ No newline at end of file
+    return run_task('update_payments', update_payments, adaptive=True)
+
+
+@app.task(bind=True)
+def index_payments(self):
+    from modules.task_schedule import run_task
+    from works.index_payments import index_payments
+    return run_task('index_payments', index_payments)
+
+
+@app.task(bind=True)
+def prune_sign_messages(self):
+    from works.prune_sign_messages import prune_sign_messages
+    return prune_sign_messages()
@@ -0,0 +1,31 @@
+import unittest
+
+from modules.account_address import (
+    check_eth_checksum_address, normalize_address, to_checksum_address
+)
+
+
+class AccountAddressTest(unittest.TestCase):
+    def test_checksum_address(self):
+        """
+        Test that checksum address is computed without web3 provider (EIP-55 test vector)
+        """
+        self.assertEqual(to_checksum_address('0x5aaeb6053f3e94c9b9a09f33669435e7ef1beaed'),
+                         '0x5aAeb6053F3E94C9b9A09f33669435E7Ef1BeAed')
+        self.assertEqual(to_checksum_address('0x5AAEB6053F3E94C9B9A09F33669435E7EF1BEAED'),
+                         '0x5aAeb6053F3E94C9b9A09f33669435E7Ef1BeAed')
+
+        with self.assertRaises(ValueError):
+            to_checksum_address('0x5aaeb6053f3e94c9b9a09f33669435e7ef1beaeg')
+
+    def test_check_checksum_address(self):
+        self.assertTrue(check_eth_checksum_address('0x5aAeb6053F3E94C9b9A09f33669435E7Ef1BeAed'))
+        self.assertTrue(check_eth_checksum_address('0x5aaeb6053f3e94c9b9a09f33669435e7ef1beaed'))
+        self.assertFalse(check_eth_checksum_address('0x5aAeb6053F3E94C9b9A09f33669435E7Ef1BeAeD'))
+        self.assertFalse(check_eth_checksum_address('0x5aAeb6053F3E94C9b9A09f3366'))
+
+    def test_normalize_address(self):
+        self.assertEqual(normalize_address('0x5aAeb6053F3E94C9b9A09f33669435E7Ef1BeAed'),
+                         '0x5aaeb6053f3e94c9b9a09f33669435e7ef1beaed')
+        self.assertEqual(normalize_address('AGjD4Mo25kzcStyh1stp7tXkUuMopD43NT'),
+                         'AGjD4Mo25kzcStyh1stp7tXkUuMopD43NT')
@@ -0,0 +1,44 @@
+import unittest
+
+from werkzeug.contrib.cache import SimpleCache
+
+from modules.cache import CacheMetrics, InstrumentedCache, get_namespace
+
+
+class CacheMetricsTest(unittest.TestCase):
+    def setUp(self):
+        self.metrics = CacheMetrics()
+        self.cache = InstrumentedCache(SimpleCache(threshold=4), metrics=self.metrics)
+
+    def test_namespace(self):
+        """
+        Test that the variable parts of the keys are grouped
+        """
+        self.assertEqual(get_namespace('/price/eth'), '/price/eth')
+        self.assertEqual(get_namespace('/db/eth/sign-message/0xabc'), '/db/<protocol>/sign-message/<address>')
+        self.assertEqual(get_namespace('/db/ont/sign-message/AXYZ'), '/db/<protocol>/sign-message/<address>')
+        self.assertEqual(get_namespace('/unknown/key'), '/unknown/*')
+
+    def test_hits_and_misses(self):
+        self.cache.get('/price/eth')
+        self.cache.set('/price/eth', {'result': 1}, timeout=10)
+        self.cache.get('/price/eth')
+        self.cache.get('/price/eth')
+
+        stats = self.metrics.snapshot()['/price/eth']
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['sets'], 1)
+        self.assertGreater(stats['value_bytes'], 0)
+        self.assertAlmostEqual(stats['hit_ratio'], 2 / 3)
+
+    def test_evictions(self):
+        """
+        Test that the entries pruned by the local cache are counted as evictions
+        """
+        for i in range(10):
+            self.cache.set('/db/eth/sign-message/{}'.format(i), i, timeout=300)
+
+        stats = self.metrics.snapshot()['/db/<protocol>/sign-message/<address>']
+        self.assertEqual(stats['sets'], 10)
+        self.assertGreater(stats['evictions'], 0)
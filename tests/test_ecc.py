@@ -0,0 +1,31 @@
+import unittest
+from hashlib import sha3_256
+
+import ecdsa
+
+from modules.ecc import VERIFY_BACKENDS, verify_signature
+
+
+class OntologySignatureTest(unittest.TestCase):
+    def setUp(self):
+        self.signing_key = ecdsa.SigningKey.generate(curve=ecdsa.NIST256p)
+        point = self.signing_key.get_verifying_key().to_string()
+        y_parity = b'\x03' if point[-1] & 1 else b'\x02'
+
+        self.uncompressed_key = b'\x04' + point
+        self.compressed_key = y_parity + point[:32]
+        self.message = b'Login to Muzika!\nSignature: abcdefghij'
+        self.signature = self.signing_key.sign(self.message, hashfunc=sha3_256)
+
+    def test_verify(self):
+        """
+        Test that all backends verify the signature with compressed and uncompressed public keys
+        """
+        for backend in VERIFY_BACKENDS:
+            for public_key in (self.compressed_key, self.uncompressed_key):
+                self.assertTrue(verify_signature(public_key, self.signature, self.message, backend=backend))
+                self.assertFalse(verify_signature(public_key, self.signature, self.message + b'!', backend=backend))
+
+    def test_invalid_public_key(self):
+        with self.assertRaises(ValueError):
+            verify_signature(b'\x05' + self.compressed_key[1:], self.signature, self.message)
@@ -0,0 +1,171 @@
+
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from unittest import mock
+
+import requests
+
+from modules.endpoint_pool import EndpointPool, EndpointUnavailable
+
+BLOCK_NUMBER_REQUEST = json.dumps({'jsonrpc': '2.0', 'method': 'eth_blockNumber', 'params': [], 'id': 1})
+
+
+class JSONRPCServer(ThreadingMixIn, HTTPServer):
+    """
+    Local stand-in JSON-RPC server that responds eth_blockNumber after the delay, or fails with the status code.
+    """
+    daemon_threads = True
+
+    def __init__(self, block_number, delay=0, status=200):
+        self.block_number = block_number
+        self.delay = delay
+        self.status = status
+        self.request_count = 0
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8'))
+                server.request_count += 1
+                time.sleep(server.delay)
+
+                body = json.dumps({'jsonrpc': '2.0', 'id': payload['id'], 'result': hex(server.block_number)})
+                self.send_response(server.status)
+                self.send_header('Content-Type', 'application/json')
+                self.end_headers()
+                self.wfile.write(body.encode('utf-8'))
+
+            def log_message(self, *args):
+                pass
+
+        super(JSONRPCServer, self).__init__(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self.server_address[1])
+
+
+def block_number(response):
+    return int(json.loads(response.decode('utf-8'))['result'], 16)
+
+
+class EndpointPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+
+    def create_pool(self, *servers):
+        self.servers.extend(servers)
+        return EndpointPool([server.url for server in servers], session=requests.Session(), timeout=2)
+
+    def test_failover_and_ejection(self):
+        """
+        Test that the requests are failed over to the healthy endpoint, and the failing endpoint is ejected
+        """
+        failing, healthy = JSONRPCServer(1, status=503), JSONRPCServer(2)
+        pool = self.create_pool(failing, healthy)
+
+        with mock.patch('config.Web3ProviderConfig.failure_threshold', 2):
+            for _ in range(5):
+                # not measured endpoints come first, so the failing endpoint is tried at first
+                pool.endpoints[0].latency = None
+                self.assertEqual(block_number(pool.request(BLOCK_NUMBER_REQUEST)), 2)
+
+        self.assertEqual(failing.request_count, 2)
+        self.assertTrue(pool.stats()[0]['ejected'])
+
+    def test_probe_after_ejection(self):
+        """
+        Test that the ejected endpoint comes back after the ejection time if the probe succeeds
+        """
+        server = JSONRPCServer(1, status=503)
+        pool = self.create_pool(server)
+
+        with mock.patch('config.Web3ProviderConfig.failure_threshold', 1), \
+                mock.patch('config.Web3ProviderConfig.ejection_time', 0.1):
+            with self.assertRaises(requests.HTTPError):
+                pool.request(BLOCK_NUMBER_REQUEST)
+
+            # circuit is open, so the request fails without sending
+            with self.assertRaises(EndpointUnavailable):
+                pool.request(BLOCK_NUMBER_REQUEST)
+            self.assertEqual(server.request_count, 1)
+
+            time.sleep(0.15)
+            server.status = 200
+
+            # a write request doesn't probe, since it cannot be sent again if the probe times out
+            with self.assertRaises(EndpointUnavailable):
+                pool.request(BLOCK_NUMBER_REQUEST)
+            self.assertEqual(server.request_count, 1)
+
+            self.assertEqual(block_number(pool.request(BLOCK_NUMBER_REQUEST, read_only=True)), 1)
+            self.assertFalse(pool.stats()[0]['ejected'])
+
+    def test_probe_unexpected_error(self):
+        """
+        Test that the endpoint can be probed again if the probe failed with an unexpected error
+        """
+        session = mock.Mock()
+        session.post.side_effect = ValueError('unexpected')
+        pool = EndpointPool(['http://127.0.0.1:1'], session=session, timeout=2)
+        pool.endpoints[0].ejected_until = time.monotonic() - 1
+
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                pool.request(BLOCK_NUMBER_REQUEST, read_only=True)
+        self.assertEqual(session.post.call_count, 2)
+
+    def test_probe_flag_owned_by_probe(self):
+        """
+        Test that a request which is not the probe doesn't clear the probe flag, so only one probe runs at a time
+        """
+        session = mock.Mock()
+        session.post.side_effect = ValueError('unexpected')
+        pool = EndpointPool(['http://127.0.0.1:1'], session=session, timeout=2)
+        endpoint = pool.endpoints[0]
+        endpoint.ejected_until = time.monotonic() - 1
+
+        endpoints, probes = pool._select(read_only=True)
+        self.assertEqual(probes, {endpoint})
+        self.assertTrue(endpoint.probing)
+
+        # a request sent before the ejection finishes while probing
+        with self.assertRaises(ValueError):
+            pool._send(endpoint, BLOCK_NUMBER_REQUEST)
+        self.assertTrue(endpoint.probing)
+        with self.assertRaises(EndpointUnavailable):
+            pool.request(BLOCK_NUMBER_REQUEST, read_only=True)
+
+    def test_hedged_read(self):
+        """
+        Test that a slow read request is hedged to the next endpoint
+        """
+        slow, fast = JSONRPCServer(1, delay=1), JSONRPCServer(2)
+        pool = self.create_pool(slow, fast)
+        pool.endpoints[0].latency, pool.endpoints[1].latency = 0.01, 0.02
+
+        with mock.patch('config.Web3ProviderConfig.hedge_delay', 0.05):
+            start = time.monotonic()
+            self.assertEqual(block_number(pool.request(BLOCK_NUMBER_REQUEST, read_only=True)), 2)
+            self.assertLess(time.monotonic() - start, 0.5)
+
+            # wait for the hedged slow request to record its latency, then make the slow endpoint the fastest again
+            deadline = time.monotonic() + 3
+            while pool.endpoints[0].latency == 0.01 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            pool.endpoints[0].latency, pool.endpoints[1].latency = 0.01, 0.02
+
+            # a write request is not hedged
+            self.assertEqual(block_number(pool.request(BLOCK_NUMBER_REQUEST, read_only=False)), 1)
+        self.assertEqual(fast.request_count, 1)
@@ -0,0 +1,202 @@
+import re
+import threading
+import unittest
+from collections import Counter
+from unittest import mock
+
+from sqlalchemy import create_engine, text
+from werkzeug.contrib.cache import SimpleCache
+
+from modules import database as db
+from modules.ipfs import crawl_objects
+
+CREATE_TABLES = [
+    """
+    CREATE TABLE `{}` (
+      `file_id` INTEGER PRIMARY KEY AUTOINCREMENT,
+      `parent_id` INTEGER,
+      `root_id` INTEGER,
+      `file_type` VARCHAR(16),
+      `ipfs_hash` VARCHAR(64),
+      `encrypted` BOOLEAN NOT NULL DEFAULT 0,
+      `name` VARCHAR(256),
+      `ipfs_object_type` VARCHAR(16),
+      `file_size` INTEGER,
+      `status` VARCHAR(16) NOT NULL DEFAULT 'pending'
+    )
+    """.format(db.table.IPFS_FILES),
+    """
+    CREATE TABLE `{}` (
+      `file_id` INTEGER PRIMARY KEY,
+      `aes_key` VARCHAR(128)
+    )
+    """.format(db.table.IPFS_FILES_PRIVATE),
+]
+
+
+class SQLiteConnection(object):
+    """
+    SQLite connection that expands the list parameters of db.statement (`IN :param`), which only MySQL supports.
+    """
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, statement, *multiparams, **params):
+        query = str(statement)
+        for name, value in list(params.items()):
+            if isinstance(value, list):
+                names = ['{}_{}'.format(name, index) for index in range(len(value))]
+                query = re.sub(r':{}\b'.format(name), '({})'.format(', '.join(':' + item for item in names)), query)
+                params.update(zip(names, value))
+                del params[name]
+        return self.connection.execute(text(query), *multiparams, **params)
+
+
+class FakeIpfs(object):
+    """
+    Stand-in IPFS node with the directories of the hashes. The hashes not in the directories are files.
+    """
+    def __init__(self, directories):
+        self.directories = directories
+        self.requests = Counter()
+        self.lock = threading.Lock()
+
+    def ls(self, ipfs_hash, opts=None):
+        with self.lock:
+            self.requests[ipfs_hash] += 1
+
+        return {'Objects': [{'Links': [
+            {'Name': name, 'Hash': link_hash, 'Type': 1 if link_hash in self.directories else 2, 'Size': 10}
+            for name, link_hash in self.directories[ipfs_hash]
+        ]}]}
+
+
+class IpfsCrawlTest(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine('sqlite://')
+        self.connection = self.engine.connect()
+        for create_table in CREATE_TABLES:
+            self.connection.execute(create_table)
+
+        self.ipfs = FakeIpfs({})
+        relay_ipfs = mock.patch('modules.ipfs.RelayIpfs')
+        relay_ipfs.start().return_value.get_connection.return_value = self.ipfs
+        self.addCleanup(relay_ipfs.stop)
+
+        # each test lists the objects without the links cached by the other tests
+        cache = SimpleCache()
+        muzika_cache = mock.patch('modules.ipfs.MuzikaCache', return_value=lambda: cache)
+        muzika_cache.start()
+        self.addCleanup(muzika_cache.stop)
+
+    def tearDown(self):
+        self.connection.close()
+
+    def add_root(self, ipfs_hash, aes_key=None):
+        file_id = self.connection.execute(text("""
+            INSERT INTO `{}` (`file_type`, `ipfs_hash`, `encrypted`, `status`)
+            VALUES ('music', :ipfs_hash, :encrypted, 'pending')
+        """.format(db.table.IPFS_FILES)), ipfs_hash=ipfs_hash, encrypted=bool(aes_key)).lastrowid
+
+        return {'file_id': file_id, 'file_type': 'music', 'ipfs_hash': ipfs_hash, 'name': None, 'root_id': None,
+                'aes_key': aes_key}
+
+    def files(self):
+        rows = self.connection.execute('SELECT * FROM `{}`'.format(db.table.IPFS_FILES)).fetchall()
+        return {row['name']: dict(row) for row in rows if row['name']}
+
+    def crawl(self, ipfs_objects, **kwargs):
+        return crawl_objects(SQLiteConnection(self.connection), ipfs_objects, **kwargs)
+
+    def test_crawl(self):
+        """
+        Test that the objects under the root are tracked level by level
+        """
+        self.ipfs.directories.update({
+            'QmRoot': [('meta.json', 'QmMeta'), ('sheet', 'QmSheet')],
+            'QmSheet': [('1.pdf', 'QmPage')],
+        })
+        root = self.add_root('QmRoot')
+
+        tracked = self.crawl([root])
+
+        files = self.files()
+        self.assertEqual(tracked, [root['file_id'], files['/sheet']['file_id']])
+        self.assertEqual(set(files.keys()), {'/', '/meta.json', '/sheet', '/sheet/1.pdf'})
+        self.assertTrue(all(row['status'] == 'success' for row in files.values()))
+        self.assertTrue(all(row['root_id'] == root['file_id'] for row in files.values()))
+        self.assertEqual(files['/sheet/1.pdf']['parent_id'], files['/sheet']['file_id'])
+
+    def test_duplicate(self):
+        """
+        Test that a directory linked in many places is listed only once
+        """
+        self.ipfs.directories.update({
+            'QmRoot': [('a', 'QmShared'), ('b', 'QmShared')],
+            'QmShared': [('1.pdf', 'QmPage')],
+        })
+
+        self.crawl([self.add_root('QmRoot')])
+
+        files = self.files()
+        self.assertEqual(self.ipfs.requests['QmShared'], 1)
+        self.assertEqual(files['/a']['status'], 'success')
+        self.assertEqual(files['/b']['status'], 'success')
+        self.assertIn('/a/1.pdf', files)
+        self.assertIn('/b/1.pdf', files)
+
+    def test_cycle(self):
+        """
+        Test that a directory linking to its ancestor is disabled
+        """
+        self.ipfs.directories.update({
+            'QmRoot': [('sheet', 'QmSheet')],
+            'QmSheet': [('back', 'QmRoot')],
+        })
+
+        self.crawl([self.add_root('QmRoot')])
+
+        files = self.files()
+        self.assertEqual(files['/sheet']['status'], 'success')
+        self.assertEqual(files['/sheet/back']['status'], 'disabled')
+        self.assertEqual(self.ipfs.requests['QmRoot'], 1)
+
+    def test_budget(self):
+        """
+        Test that the objects beyond max_objects are left pending even in the middle of a level
+        """
+        self.ipfs.directories.update({
+            'QmFirst': [('1.pdf', 'QmPage1'), ('2.pdf', 'QmPage2'), ('3.pdf', 'QmPage3')],
+            'QmSecond': [('1.pdf', 'QmPage4'), ('2.pdf', 'QmPage5'), ('3.pdf', 'QmPage6')],
+        })
+        first, second = self.add_root('QmFirst'), self.add_root('QmSecond')
+
+        # the first object is tracked even if its links exceed the budget
+        self.assertEqual(self.crawl([first, second], max_objects=2), [first['file_id']])
+
+        statuses = dict(self.connection.execute(text('SELECT `file_id`, `status` FROM `{}`'
+                                                     .format(db.table.IPFS_FILES))).fetchall())
+        self.assertEqual(statuses[first['file_id']], 'success')
+        self.assertEqual(statuses[second['file_id']], 'pending')
+        self.assertEqual(len(statuses), 5)
+
+        # the pending object is tracked at the next time
+        self.assertEqual(self.crawl([second], max_objects=2), [second['file_id']])
+
+    def test_encrypted(self):
+        """
+        Test that the AES key of the root is saved for all objects under it
+        """
+        self.ipfs.directories.update({
+            'QmRoot': [('meta.json', 'QmMeta'), ('sheet', 'QmSheet')],
+            'QmSheet': [('1.pdf', 'QmPage')],
+        })
+
+        self.crawl([self.add_root('QmRoot', aes_key='secret-key')])
+
+        aes_keys = dict(self.connection.execute('SELECT `file_id`, `aes_key` FROM `{}`'
+                                                .format(db.table.IPFS_FILES_PRIVATE)).fetchall())
+        files = self.files()
+        for name in ('/meta.json', '/sheet', '/sheet/1.pdf'):
+            self.assertTrue(files[name]['encrypted'])
+            self.assertEqual(aes_keys[files[name]['file_id']], 'secret-key')
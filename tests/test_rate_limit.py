@@ -0,0 +1,33 @@
+import unittest
+from unittest import mock
+
+from modules.rate_limit import LocalTokenBucket, by_keys
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_consume(self):
+        """
+        Test that the requests over capacity are rejected until the bucket is filled again
+        """
+        bucket = LocalTokenBucket()
+
+        with mock.patch('modules.rate_limit.time.time', return_value=1000.0):
+            self.assertTrue(all(bucket.consume('login/ip/127.0.0.1', rate=1, capacity=3) for _ in range(3)))
+            self.assertFalse(bucket.consume('login/ip/127.0.0.1', rate=1, capacity=3))
+
+            # the other key has its own bucket
+            self.assertTrue(bucket.consume('login/ip/127.0.0.2', rate=1, capacity=3))
+
+        with mock.patch('modules.rate_limit.time.time', return_value=1001.5):
+            self.assertTrue(bucket.consume('login/ip/127.0.0.1', rate=1, capacity=3))
+            self.assertFalse(bucket.consume('login/ip/127.0.0.1', rate=1, capacity=3))
+
+    def test_by_keys(self):
+        """
+        Test that the combined key has all keys, and is None if any key doesn't exist
+        """
+        by_address_and_ip = by_keys(lambda: ('address', '0xabc'), lambda: ('ip', '127.0.0.1'))
+        self.assertEqual(by_address_and_ip(), ('address+ip', '0xabc/127.0.0.1'))
+
+        by_no_address_and_ip = by_keys(lambda: ('address', None), lambda: ('ip', '127.0.0.1'))
+        self.assertEqual(by_no_address_and_ip(), ('address+ip', None))
@@ -0,0 +1,45 @@
+
+import unittest
+from unittest import mock
+
+from modules.task_schedule import LocalTaskSchedule, run_task, wake_task
+
+
+class TaskScheduleTest(unittest.TestCase):
+    def setUp(self):
+        self.schedule = LocalTaskSchedule()
+        patcher = mock.patch('modules.task_schedule.get_task_schedule', return_value=self.schedule)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_skip_if_running(self):
+        """
+        Test that the task is skipped while the same task is running
+        """
+        def _task():
+            return run_task('update_contracts', lambda: 1)
+
+        self.assertEqual(run_task('update_contracts', _task), {'skipped': 'running'})
+        self.assertEqual(run_task('update_contracts', lambda: 1), 1)
+
+    @mock.patch('config.TaskScheduleConfig.min_interval', 10)
+    @mock.patch('config.TaskScheduleConfig.max_interval', 40)
+    def test_backoff_and_wake(self):
+        """
+        Test that the interval is backed off if nothing to do, and reset if woken
+        """
+        with mock.patch('modules.task_schedule.time.time', return_value=1000.0):
+            # the first run and the next run
+            self.assertEqual(run_task('update_payments', lambda: 0, adaptive=True), 0)
+            self.assertEqual(self.schedule.get('update_payments'), (10, 1010.0))
+
+        with mock.patch('modules.task_schedule.time.time', return_value=1010.0):
+            self.assertEqual(run_task('update_payments', lambda: 0, adaptive=True), 0)
+            self.assertEqual(self.schedule.get('update_payments'), (20, 1030.0))
+
+        with mock.patch('modules.task_schedule.time.time', return_value=1020.0):
+            self.assertEqual(run_task('update_payments', lambda: 0, adaptive=True), {'skipped': 'backoff'})
+
+            wake_task('update_payments')
+            self.assertEqual(run_task('update_payments', lambda: 3, adaptive=True), 3)
+            self.assertEqual(self.schedule.get('update_payments'), (10, 1030.0))
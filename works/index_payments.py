@@ -0,0 +1,135 @@
+from eth_utils import encode_hex, keccak
+from sqlalchemy import text
+
+from config import MuzikaContractConfig
+from modules import database as db
+from modules.account_address import to_checksum_address
+from modules.checkpoint import get_checkpoint, set_checkpoint
+from modules.web3 import get_web3
+
+PURCHASE_EVENT_TOPIC = keccak(text='Purchase(address,uint256)')
+
+CHECKPOINT_NAME = 'payments'
+
+
+def get_purchase_events(web3, from_block, to_block):
+    """
+    Returns a dict of transaction hash (lowercase) and its purchase event in the block range. If a transaction emits
+    several purchase events, use the last one.
+    """
+    logs = web3.eth.getLogs({
+        'fromBlock': from_block,
+        'toBlock': to_block,
+        'topics': [encode_hex(PURCHASE_EVENT_TOPIC)]
+    })
+
+    # the log entries in the list are not converted to AttributeDict by web3
+    return {log['transactionHash'].hex().lower(): parse_purchase_event(log) for log in logs}
+
+
+def parse_purchase_event(log):
+    """
+    Returns the contract address, buyer and price of the purchase event log.
+    """
+    # structure of event is `Purchase(address,uint256)`, so buyer is topics[1] and price is data
+    return {
+        'contract_address': log['address'],
+        'buyer_address': to_checksum_address('0x' + log['topics'][1].hex()[-40:]),
+        'price': log['data']
+    }
+
+
+def confirm_payments(connection, events):
+    """
+    Matches the purchase events with the pending payments and the contracts in bulk, and updates the payments.
+
+    Returns the number of confirmed (success) payments and invalid payments.
+    """
+    if not events:
+        return 0, 0
+
+    payments = db.statement(db.table.MUSIC_PAYMENTS).columns('payment_id', 'tx_hash')\
+        .where(status='pending', tx_hash=list(events.keys())).select(connection).fetchall()
+
+    if not payments:
+        return 0, 0
+
+    contract_addresses = list(set([events[payment['tx_hash'].lower()]['contract_address'] for payment in payments]))
+    contracts = db.statement(db.table.MUSIC_CONTRACTS).columns('contract_address')\
+        .where(status='success', contract_address=contract_addresses).select(connection).fetchall()
+    contracts = set([contract['contract_address'].lower() for contract in contracts])
+
+    success_params = []
+    invalid_params = []
+    for payment in payments:
+        event = events[payment['tx_hash'].lower()]
+
+        if event['contract_address'].lower() in contracts:
+            success_params.append(dict(event, payment_id=payment['payment_id']))
+        else:
+            # Contract is not exists in our database. It is not a contract for muzika platform
+            invalid_params.append({'payment_id': payment['payment_id']})
+
+    success_query_statement = """
+        UPDATE `{}`
+        SET
+          `buyer_address` = :buyer_address,
+          `contract_address` = :contract_address,
+          `price` = :price,
+          `status` = 'success'
+        WHERE `payment_id` = :payment_id AND `status` = 'pending'
+    """.format(db.table.MUSIC_PAYMENTS)
+
+    invalid_query_statement = """
+        UPDATE `{}` SET `status` = 'invalid'
+        WHERE `payment_id` = :payment_id AND `status` = 'pending'
+    """.format(db.table.MUSIC_PAYMENTS)
+
+    if success_params:
+        connection.execute(text(success_query_statement), *success_params)
+    if invalid_params:
+        connection.execute(text(invalid_query_statement), *invalid_params)
+
+    return len(success_params), len(invalid_params)
+
+
+def index_payments():
+    """
+    Confirms the payments by scanning purchase event logs from the last checkpoint block, instead of querying
+    the receipt of every payment transaction.
+
+    Only the blocks that have enough confirmations are scanned, so the events are not removed by chain
+    reorganization after confirmed. This is the only place that marks payments as success. The payments that are not
+    confirmed by this (failed or invalid transactions) are handled by update_payments.
+    """
+    web3 = get_web3()
+    latest_block = web3.eth.blockNumber - MuzikaContractConfig.confirmations
+
+    result = {'from_block': None, 'to_block': None, 'success': 0, 'invalid': 0}
+
+    with db.engine_rdwr.connect() as connection:
+        checkpoint = get_checkpoint(connection, CHECKPOINT_NAME,
+                                    default=max(0, latest_block - MuzikaContractConfig.index_initial_blocks))
+        from_block = checkpoint + 1
+        result['from_block'] = from_block
+
+        for _ in range(MuzikaContractConfig.index_max_ranges):
+            if from_block > latest_block:
+                break
+
+            to_block = min(from_block + MuzikaContractConfig.log_block_range - 1, latest_block)
+            events = get_purchase_events(web3, from_block, to_block)
+
+            # the payments and the checkpoint are updated together
+            with connection.begin():
+                success, invalid = confirm_payments(connection, events)
+                set_checkpoint(connection, CHECKPOINT_NAME, to_block)
+
+            result.update({
+                'to_block': to_block,
+                'success': result['success'] + success,
+                'invalid': result['invalid'] + invalid
+            })
+            from_block = to_block + 1
+
+    return result
@@ -0,0 +1,224 @@
+"""
+ Listen_chain.py
+
+ listens new blocks and purchase logs through the websocket endpoint (Web3ProviderConfig.websocket_url), and triggers
+ the confirmation tasks only when a block contains relevant transactions, instead of polling every 10 seconds.
+
+    - new block: if the block contains pending contract transactions, trigger update_contracts.
+    - purchase log: when the block of the log gets enough confirmations, trigger index_payments.
+    - payment: when the block containing a pending payment transaction gets enough confirmations, trigger
+      index_payments, and when the indexer has passed the block, trigger update_payments (ex. failed payments that
+      emit no purchase log).
+
+ The last processed block is persisted as a checkpoint, so the blocks mined while disconnected are caught up after
+ reconnecting. The blocks waiting for confirmations are kept in memory, so after restarting, the blocks after the
+ checkpoint of index_payments are waited again.
+
+ It runs as a long-running process.
+
+ > python -m works.listen_chain
+"""
+
+import asyncio
+import json
+import logging
+import time
+from itertools import count
+
+import websockets
+import websockets.exceptions
+from eth_utils import encode_hex
+
+from config import MuzikaContractConfig, Web3ProviderConfig
+from modules import database as db
+from modules.chain import ChainClient
+from modules.checkpoint import get_checkpoint, set_checkpoint
+from works.index_payments import CHECKPOINT_NAME as INDEX_CHECKPOINT_NAME, PURCHASE_EVENT_TOPIC
+
+CHECKPOINT_NAME = 'listener'
+
+logger = logging.getLogger(__name__)
+
+
+class SubscriptionError(Exception):
+    pass
+
+
+def _trigger(task_name):
+    def _delay():
+        import tasks
+        from modules.task_schedule import wake_task
+
+        # the task may be backed off, so wake it first
+        wake_task(task_name)
+        getattr(tasks, task_name).delay()
+    return _delay
+
+
+class ChainListener:
+    """
+    Subscribes new heads and purchase logs, and calls the handlers when the relevant blocks are mined.
+    """
+
+    def __init__(self, websocket_url=None, chain=None, on_contracts=None, on_payments=None, on_purchases=None):
+        self.websocket_url = websocket_url or Web3ProviderConfig.websocket_url
+        self.chain = chain or ChainClient()
+        self.on_contracts = on_contracts or _trigger('update_contracts')
+        self.on_payments = on_payments or _trigger('update_payments')
+        self.on_purchases = on_purchases or _trigger('index_payments')
+
+        # the blocks that have purchase logs or pending payments but not confirmed yet
+        self.purchase_blocks = set()
+
+        # the blocks that have pending payments but not passed by the indexer yet
+        self.payment_blocks = set()
+
+        # whether the blocks waiting for confirmations are restored after starting
+        self._restored = False
+
+        self._request_id = count(1)
+
+    def run(self):
+        """
+        Listens forever. If disconnected, reconnects with backoff.
+        """
+        loop = asyncio.get_event_loop()
+        delay = MuzikaContractConfig.listener_reconnect_delay
+
+        while True:
+            started_at = time.monotonic()
+            try:
+                loop.run_until_complete(self.listen())
+            except (OSError, asyncio.TimeoutError, SubscriptionError,
+                    websockets.exceptions.ConnectionClosed, websockets.exceptions.InvalidHandshake) as e:
+                logger.warning('Disconnected from %s: %r', self.websocket_url, e)
+            except Exception:
+                logger.exception('Failed to process blocks')
+
+            # if the connection lasted for a while, reconnect quickly
+            if time.monotonic() - started_at > MuzikaContractConfig.listener_max_reconnect_delay:
+                delay = MuzikaContractConfig.listener_reconnect_delay
+
+            time.sleep(delay)
+            delay = min(delay * 2, MuzikaContractConfig.listener_max_reconnect_delay)
+
+    async def listen(self):
+        loop = asyncio.get_event_loop()
+
+        async with websockets.connect(self.websocket_url) as websocket:
+            heads_subscription = await self._subscribe(websocket, ['newHeads'])
+            logs_subscription = await self._subscribe(websocket, ['logs', {
+                'topics': [encode_hex(PURCHASE_EVENT_TOPIC)]
+            }])
+
+            # catch up the blocks mined while disconnected, after subscribing not to miss any block
+            latest_block = await loop.run_in_executor(None, self._block_number)
+            await loop.run_in_executor(None, self.process_blocks, latest_block)
+
+            while True:
+                # newHeads is notified every block, so if nothing comes for a long time, the connection is broken
+                message = json.loads(await asyncio.wait_for(websocket.recv(),
+                                                            timeout=MuzikaContractConfig.listener_idle_timeout))
+                params = message.get('params') or {}
+                subscription, result = params.get('subscription'), params.get('result')
+
+                if subscription == heads_subscription:
+                    await loop.run_in_executor(None, self.process_blocks, int(result['number'], 16))
+                elif subscription == logs_subscription and not result.get('removed'):
+                    self.purchase_blocks.add(int(result['blockNumber'], 16))
+
+    async def _subscribe(self, websocket, params):
+        request_id = next(self._request_id)
+        await websocket.send(json.dumps({'jsonrpc': '2.0', 'id': request_id, 'method': 'eth_subscribe',
+                                         'params': params}))
+
+        # notifications of the previous subscriptions may come first, but the blocks are caught up after subscribing
+        while True:
+            message = json.loads(await asyncio.wait_for(websocket.recv(),
+                                                        timeout=MuzikaContractConfig.listener_idle_timeout))
+            if message.get('id') == request_id:
+                if 'error' in message:
+                    raise SubscriptionError(message['error'])
+                return message['result']
+
+    def _block_number(self):
+        return int(self.chain.batch_request('eth_blockNumber', [[]])[0], 16)
+
+    def process_blocks(self, to_block):
+        """
+        Checks the blocks from the checkpoint to the block, and triggers the handlers.
+        """
+        with db.engine_rdwr.connect() as connection:
+            checkpoint = get_checkpoint(connection, CHECKPOINT_NAME, default=to_block - 1)
+
+            # the same block number is notified again if the chain is reorganized, and the tasks check it anyway
+            if checkpoint >= to_block:
+                return
+
+            from_block = max(checkpoint + 1, to_block - MuzikaContractConfig.listener_max_catch_up + 1)
+
+            # if skipped some blocks, the transactions in them are unknown, so trigger all
+            skipped = from_block > checkpoint + 1
+
+            if not self._restored:
+                # the blocks waiting for confirmations were lost, and the blocks after the index checkpoint may have
+                # them. Wait for the last processed block, since the indexer scans all blocks before it.
+                index_checkpoint = get_checkpoint(connection, INDEX_CHECKPOINT_NAME)
+                if index_checkpoint is not None and index_checkpoint < checkpoint:
+                    self.purchase_blocks.add(checkpoint)
+                    self.payment_blocks.add(checkpoint)
+                self._restored = True
+
+            # transaction hash and its block number
+            tx_blocks = {}
+            blocks = self.chain.batch_request('eth_getBlockByNumber', [
+                [hex(block_number), False] for block_number in range(from_block, to_block + 1)
+            ])
+            for block in blocks:
+                if block is not None:
+                    tx_blocks.update((tx_hash.lower(), int(block['number'], 16)) for tx_hash in block['transactions'])
+
+            # the purchase logs in the caught up blocks were not notified
+            if to_block > from_block:
+                logs = self.chain.batch_request('eth_getLogs', [[{
+                    'fromBlock': hex(from_block),
+                    'toBlock': hex(to_block - 1),
+                    'topics': [encode_hex(PURCHASE_EVENT_TOPIC)]
+                }]])[0] or []
+                self.purchase_blocks.update(int(log['blockNumber'], 16) for log in logs)
+
+            pending_contracts = db.statement(db.table.MUSIC_CONTRACTS).columns('tx_hash')\
+                .where(status='pending').select(connection).fetchall()
+            pending_payments = db.statement(db.table.MUSIC_PAYMENTS).columns('tx_hash')\
+                .where(status='pending').select(connection).fetchall()
+
+            if skipped or any(row['tx_hash'].lower() in tx_blocks for row in pending_contracts):
+                self.on_contracts()
+
+            # the payments are confirmed by the indexer, so wait for the blocks to be confirmed and indexed
+            payment_blocks = set(tx_blocks[row['tx_hash'].lower()] for row in pending_payments
+                                 if row['tx_hash'].lower() in tx_blocks)
+            if skipped:
+                payment_blocks.add(to_block)
+            self.purchase_blocks |= payment_blocks
+            self.payment_blocks |= payment_blocks
+
+            confirmed_blocks = set(block_number for block_number in self.purchase_blocks
+                                   if block_number + MuzikaContractConfig.confirmations <= to_block)
+            if skipped or confirmed_blocks:
+                self.on_purchases()
+            self.purchase_blocks -= confirmed_blocks
+
+            index_checkpoint = get_checkpoint(connection, INDEX_CHECKPOINT_NAME)
+            indexed_blocks = set(block_number for block_number in self.payment_blocks
+                                 if index_checkpoint is not None and block_number <= index_checkpoint)
+            if skipped or indexed_blocks:
+                self.on_payments()
+            self.payment_blocks -= indexed_blocks
+
+            set_checkpoint(connection, CHECKPOINT_NAME, to_block)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    ChainListener().run()
@@ -0,0 +1,54 @@
+from sqlalchemy import text
+
+from config import SignMessageConfig
+from modules import database as db
+
+
+def prune_sign_messages():
+    """
+    Deletes the sign messages that cannot be used for authentication anymore, so JWT authentication joins only with
+    the small table.
+
+        - the JWT token issued with the sign message is expired (30 days).
+        - the sign message has no private key (failed to sign in) after unsigned message is expired.
+
+    The rows are deleted in small batches for not locking the table for a long time. Returns the number of deleted rows
+    and the table size after deletion.
+    """
+
+    delete_query_statement = """
+        DELETE FROM `{}`
+        WHERE
+            `created_at` < NOW() - INTERVAL :jwt_expired_time SECOND
+         OR (`private_key` IS NULL AND `created_at` < NOW() - INTERVAL :unsigned_expired_time SECOND)
+        ORDER BY `message_id`
+        LIMIT :batch_size
+    """.format(db.table.SIGN_MESSAGES)
+
+    table_size_query_statement = """
+        SELECT `TABLE_ROWS` AS `rows`, `DATA_LENGTH` AS `data_length`, `INDEX_LENGTH` AS `index_length`
+        FROM `information_schema`.`TABLES`
+        WHERE `TABLE_SCHEMA` = DATABASE() AND `TABLE_NAME` = :table_name
+    """
+
+    deleted = 0
+
+    with db.engine_rdwr.connect() as connection:
+        for _ in range(SignMessageConfig.prune_max_batches):
+            deleted_rows = connection.execute(text(delete_query_statement),
+                                              jwt_expired_time=SignMessageConfig.jwt_expired_time,
+                                              unsigned_expired_time=SignMessageConfig.unsigned_message_expired_time,
+                                              batch_size=SignMessageConfig.prune_batch_size).rowcount
+            deleted += deleted_rows
+
+            # if deleted less than batch size, no more rows to delete
+            if deleted_rows < SignMessageConfig.prune_batch_size:
+                break
+
+        table_size = connection.execute(text(table_size_query_statement),
+                                        table_name=db.table.SIGN_MESSAGES).fetchone()
+
+    return {
+        'deleted': deleted,
+        'table_size': dict(table_size) if table_size else None
+    }
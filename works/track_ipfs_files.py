@@ -0,0 +1,80 @@
+from sqlalchemy import text
+
+from config import IPFSConfig
+from modules import database as db
+from modules.chain import map_concurrently
+from modules.ipfs import crawl_objects, get_meta
+
+
+def track_ipfs_files():
+    """
+    Tracks the pending IPFS objects in batches, instead of tracking each uploaded post in its own task.
+
+    The pending objects are tracked `IPFSConfig.track_batch_size` objects at a time with the objects under them, and
+    the directories left pending by the crawl budget are tracked by the next batches. After tracking, the meta files
+    of the contracts whose IPFS objects are tracked but not translated yet are translated, so a meta file that was
+    not found is tried again at the next time.
+
+    Returns the number of tracked objects.
+    """
+    pending_query_statement = """
+        SELECT `f`.*, `p`.`aes_key` FROM `{}` `f`
+        LEFT JOIN `{}` `p`
+          ON (`f`.`file_id` = `p`.`file_id`)
+        WHERE `f`.`status` = 'pending'
+        ORDER BY `f`.`file_id`
+        LIMIT :batch_size
+    """.format(db.table.IPFS_FILES, db.table.IPFS_FILES_PRIVATE)
+
+    untranslated_query_statement = """
+        SELECT `mc`.`contract_id`, `f`.`ipfs_hash` FROM `{}` `mc`
+        INNER JOIN `{}` `f`
+          ON (`f`.`file_id` = `mc`.`ipfs_file_id`)
+        WHERE (`mc`.`meta` IS NULL OR `mc`.`meta` = '') AND `f`.`status` = 'success'
+        ORDER BY `mc`.`contract_id` DESC
+        LIMIT :batch_size
+    """.format(db.table.MUSIC_CONTRACTS, db.table.IPFS_FILES)
+
+    translated_query_statement = """
+        UPDATE `{}` SET `meta` = :meta WHERE `contract_id` = :contract_id
+    """.format(db.table.MUSIC_CONTRACTS)
+
+    tracked = []
+
+    with db.engine_rdwr.connect() as connection:
+        for _ in range(IPFSConfig.track_max_batches):
+            ipfs_objects = db.to_relation_model_list(
+                connection.execute(text(pending_query_statement), batch_size=IPFSConfig.track_batch_size)
+            )
+
+            if not ipfs_objects:
+                break
+
+            with connection.begin():
+                tracked.extend(crawl_objects(connection, ipfs_objects, timeout=IPFSConfig.track_timeout))
+
+        # translate all contracts that are not translated yet, including the ones failed at the previous times
+        contracts = db.to_relation_model_list(
+            connection.execute(text(untranslated_query_statement), batch_size=IPFSConfig.translate_batch_size)
+        )
+
+        # the meta files are fetched concurrently, since a missing meta file waits for the timeouts
+        metas = map_concurrently(get_meta, set(contract['ipfs_hash'] for contract in contracts),
+                                 max_workers=IPFSConfig.crawl_concurrency)
+
+        translated_params = []
+        for contract in contracts:
+            meta, error = metas[contract['ipfs_hash']]
+
+            # the meta file may not be found yet, so translate it at the next time
+            if isinstance(error, ValueError):
+                continue
+            elif error is not None:
+                raise error
+
+            translated_params.append({'contract_id': contract['contract_id'], 'meta': meta})
+
+        if translated_params:
+            connection.execute(text(translated_query_statement), *translated_params)
+
+    return len(tracked)
@@ -1,14 +1,16 @@
 from sqlalchemy import text
-from web3.utils.threads import Timeout
 
 from config import MuzikaContractConfig
 from modules import database as db
-from modules.muzika_contract import MuzikaContractHandler
+from modules.chain import ChainClient
 from modules.web3 import get_web3
-from modules.contracts.paper_contract import MuzikaPaperContract
+from modules.contracts.paper_contract import PaperContractMulticall, get_paper_contract_validator
 
 
 def update_contracts():
+    """
+    Confirms the pending contracts, and returns the number of the pending contracts.
+    """
     web3 = get_web3()
 
     complete_delete_query_statement = """
@@ -40,6 +42,23 @@ def update_contracts():
           `mc`.`status` = :track_status
     """.format(db.table.MUSIC_CONTRACTS, db.table.board('music'), db.table.USERS)
 
+    delete_post_query_statement = """
+        UPDATE `{}` SET `status` = 'deleted' WHERE `post_id` = :post_id
+    """.format(db.table.board('music'))
+
+    success_contract_query_statement = """
+        UPDATE `{}`
+        SET
+          `contract_address` = :contract_address,
+          `seller_address` = :seller_address,
+          `status` = 'success'
+        WHERE `contract_id` = :contract_id
+    """.format(db.table.MUSIC_CONTRACTS)
+
+    failed_contract_query_statement = """
+        UPDATE `{}` SET `status` = :status WHERE `contract_id` = :contract_id
+    """.format(db.table.MUSIC_CONTRACTS)
+
     with db.engine_rdwr.connect() as connection:
         # DELETE contracts completely that are not mined over specific time
         connection.execute(text(complete_delete_query_statement),
@@ -56,64 +75,82 @@ def update_contracts():
             connection.execute(text(transaction_query_statement), track_status='pending')
         )
 
-        # get original bytecode of the paper contract
-        contract_handler = MuzikaContractHandler()
-        payment_interface_contract = contract_handler.get_interface('Dispatcher')
-        payment_contract = contract_handler.get_interface('MuzikaPaperContract')
-        contract_bytecode = payment_contract['bytecode'][:-68]
-        contract_bytecode = contract_bytecode.replace(
-            '__LibPaperPaymentInterface______________',
-            payment_interface_contract['networks'][web3.version.network]['address'][2:]
-        )
+        # get receipts of all contracts and transactions of the mined contracts in batch requests
+        chain = ChainClient()
+        receipts = chain.get_transaction_receipts([contract['tx_hash'] for contract in contracts])
+        transactions = chain.get_transactions([tx_hash for tx_hash, receipt in receipts.items() if receipt])
+
+        # check that the transactions deploy the paper contract
+        valid_transactions = get_paper_contract_validator(web3.version.network).validate_transactions(transactions)
+
+        # get sellers of the mined contracts at once
+        sellers = PaperContractMulticall(web3, chain).get_sellers([receipt['contractAddress']
+                                                                   for receipt in receipts.values()
+                                                                   if receipt and receipt['contractAddress']])
+
+        # rows to update in the write phase
+        deleted_posts = []
+        success_contracts = []
+        failed_contracts = []
 
         for contract in contracts:
             contract_status = 'success'
             board_status = 'posted'
 
-            try:
-                tx_receipt = web3.eth.waitForTransactionReceipt(transaction_hash=contract['tx_hash'], timeout=1)
-            except Timeout:
-                # if failed to get contract (not mined or fake transaction), check next contract
-                continue
-
-            if tx_receipt:
-                # TODO : validate the contract
+            tx_receipt = receipts.get(contract['tx_hash'])
+            tx = transactions.get(contract['tx_hash'])
 
-                try:
-                    contract_address = tx_receipt['contractAddress']
-                    tx_contract = MuzikaPaperContract(web3, contract_address=contract_address)
-                    seller_address = tx_contract.get_seller()
+            # if failed to get contract (not mined or fake transaction), check next contract
+            if not tx_receipt or not tx:
+                continue
 
-                    tx = web3.eth.getTransaction(contract['tx_hash'])
+            # TODO : validate the contract
 
-                    # if tx data is invalid, set contract status to invalid and board status to deleted
-                    if tx.input[:len(contract_bytecode)] != contract_bytecode:
-                        contract_status = 'invalid'
-                        board_status = 'deleted'
+            contract_address = tx_receipt['contractAddress']
+            seller_address, seller_error = sellers.get(contract_address, (None, None))
 
-                    # Check seller.
-                    # If the contract is derived from music post but the author of it is different from the real
-                    # contract owner, set status to success but delete post
-                    if contract['address'] and seller_address != contract['address']:
-                        board_status = 'deleted'
-                except ValueError as e:
-                    # if ValueError occurs (may be wrong transaction), set invalid contracvt and delete post
+            if contract_address is None or isinstance(seller_error, ValueError):
+                # if not a contract creation or ValueError occurs (may be wrong transaction),
+                # set invalid contract and delete post
+                contract_status = 'invalid'
+                board_status = 'deleted'
+            elif seller_error is not None:
+                # if failed to call the contract, check it again at the next time
+                continue
+            else:
+                # if tx data is invalid, set contract status to invalid and board status to deleted
+                if not valid_transactions.get(contract['tx_hash']):
                     contract_status = 'invalid'
                     board_status = 'deleted'
 
-                if board_status == 'deleted':
-                    db.Statement(db.table.board('music'))\
-                        .set(status='deleted')\
-                        .where(post_id=contract['post_id'])\
-                        .update(connection)
-
-                if contract_status == 'success':
-                    db.Statement(db.table.MUSIC_CONTRACTS)\
-                        .set(contract_address=contract_address, seller_address=seller_address, status='success')\
-                        .where(contract_id=contract['contract_id'])\
-                        .update(connection)
-                else:
-                    db.Statement(db.table.MUSIC_CONTRACTS)\
-                        .set(status=contract_status)\
-                        .where(contract_id=contract['contract_id'])\
-                        .update(connection)
\ No newline at end of file
+                # Check seller.
+                # If the contract is derived from music post but the author of it is different from the real
+                # contract owner, set status to success but delete post
+                if contract['address'] and seller_address != contract['address']:
+                    board_status = 'deleted'
+
+            if board_status == 'deleted':
+                deleted_posts.append({'post_id': contract['post_id']})
+
+            if contract_status == 'success':
+                success_contracts.append({
+                    'contract_id': contract['contract_id'],
+                    'contract_address': contract_address,
+                    'seller_address': seller_address
+                })
+            else:
+                failed_contracts.append({
+                    'contract_id': contract['contract_id'],
+                    'status': contract_status
+                })
+
+        # update all contracts and posts at once
+        with connection.begin():
+            if deleted_posts:
+                connection.execute(text(delete_post_query_statement), *deleted_posts)
+            if success_contracts:
+                connection.execute(text(success_contract_query_statement), *success_contracts)
+            if failed_contracts:
+                connection.execute(text(failed_contract_query_statement), *failed_contracts)
+
+    return len(contracts)
@@ -1,18 +1,21 @@
 from sqlalchemy import text
-from web3.utils.threads import Timeout
 
 from config import MuzikaContractConfig
 from modules import database as db
-from modules.web3 import get_web3
+from modules.chain import ChainClient
+from modules.checkpoint import get_checkpoint
+from works.index_payments import CHECKPOINT_NAME as INDEX_CHECKPOINT_NAME, PURCHASE_EVENT_TOPIC, \
+    confirm_payments, parse_purchase_event
 
 
 def update_payments():
     """
     All of transaction for purchase of music is not reliable,
     which can have price, buyer or contract address.
-    Therefore we have to wait for transaction to be mined with txHash and get receipt
-    of the txHash, then all of information (price, buyer etc.) are obtained by the receipt.
-    Then, save the information to our database
+
+    The successful payments are confirmed by the purchase event logs with enough confirmations (see
+    works/index_payments.py). This handles the other payments, whose transactions are failed, invalid or not mined
+    for a long time, and the payments submitted after the indexer had scanned their blocks.
 
     Status
         pending  : Ready for mined transaction given hash.
@@ -20,9 +23,27 @@ def update_payments():
         failed   : The transaction is failed because of out of gas, not enough muzika or any other reason.
         invalid  : The transaction is invalid (e.g. this transaction is not for purchase of music)
         disabled : The transaction is not found in the blockchain (That is, timeout of waiting for transaction)
+
+    Only the payments in the blocks that the indexer has passed are marked, so a transaction reorganized into another
+    block is not marked by the unconfirmed receipt. The payments created recently cannot be in those blocks yet, so
+    their receipts are not queried.
+
+    Returns the number of the checked payments.
     """
-    web3 = get_web3()
-    purchase_event_name = web3.sha3(b'Purchase(address,uint256)')
+    pending_query_statement = """
+        SELECT `payment_id`, `tx_hash` FROM `{}`
+        WHERE
+            `status` = 'pending'
+        AND `created_at` < NOW() - INTERVAL :check_delay SECOND
+    """.format(db.table.MUSIC_PAYMENTS)
+
+    failed_query_statement = """
+        UPDATE `{}` SET `status` = 'failed' WHERE `payment_id` = :payment_id AND `status` = 'pending'
+    """.format(db.table.MUSIC_PAYMENTS)
+
+    invalid_query_statement = """
+        UPDATE `{}` SET `status` = 'invalid' WHERE `payment_id` = :payment_id AND `status` = 'pending'
+    """.format(db.table.MUSIC_PAYMENTS)
 
     # query for updating status of timeout transaction
     update_query_statement = """
@@ -41,35 +62,34 @@ def update_payments():
     """.format(db.table.MUSIC_PAYMENTS)
 
     with db.engine_rdwr.connect() as connection:
+        # the last block scanned by the indexer. If it never ran, no block is confirmed yet.
+        indexed_block = get_checkpoint(connection, INDEX_CHECKPOINT_NAME)
+
+        payments = []
+        if indexed_block is not None:
+            payments = db.to_relation_model_list(
+                connection.execute(text(pending_query_statement),
+                                   check_delay=MuzikaContractConfig.payment_check_delay)
+            )
 
-        # get list of payment history that is not mined (wait)
-        payments = db.to_relation_model_list(
-            db.Statement(db.table.MUSIC_PAYMENTS).where(status='pending').select(connection)
-        )
+        # get receipts of the payments in batch requests. The receipts of the mined transactions are cached.
+        receipts = ChainClient().get_transaction_receipts([payment['tx_hash'] for payment in payments])
 
-        def invalid_payment(__payment):
-            # this transaction is not valid
-            db.Statement(db.table.MUSIC_PAYMENTS)\
-                .set(status='invalid')\
-                .where(payment_id=__payment['payment_id'])\
-                .update(connection)
+        # rows to update in the write phase
+        failed_payments = []
+        invalid_payments = []
+        purchase_events = {}
 
         for payment in payments:
-            try:
-                receipt = web3.eth.waitForTransactionReceipt(transaction_hash=payment['tx_hash'], timeout=1)
-            except Timeout:
-                continue
+            receipt = receipts.get(payment['tx_hash'])
 
-            if not receipt:
+            # not mined yet, or the block is not confirmed by the indexer yet
+            if not receipt or receipt.blockNumber is None or receipt.blockNumber > indexed_block:
                 continue
 
             if receipt.status == 0:
                 # this transaction is failed
-                db.Statement(db.table.MUSIC_PAYMENTS)\
-                    .set(status='failed')\
-                    .where(payment_id=payment['payment_id'])\
-                    .update(connection)
-
+                failed_payments.append({'payment_id': payment['payment_id']})
                 continue
 
             """
@@ -77,50 +97,36 @@ def update_payments():
             transaction is MuzikaCoin contract's address
 
                 MuzikaCoin.address == tx['to']
-                
+
             Contract address is equal to event.address
             """
 
-            purchase_events = [event for event in receipt.logs if event.topics[0] == purchase_event_name]
+            events = [event for event in receipt.logs if event.topics and event.topics[0] == PURCHASE_EVENT_TOPIC]
 
-            if len(purchase_events) == 0:
+            if len(events) == 0:
                 # Purchase event is not emitted
-                invalid_payment(payment)
-                continue
-
-            event = purchase_events[-1]
-            contract_address = event.address
-            contract_exists = db.Statement(db.table.MUSIC_CONTRACTS).columns('"_"')\
-                .where(contract_address=contract_address, status='success')\
-                .limit(1).select(connection).fetchone()
-
-            if contract_exists is None:
-                # Contract is not exists in our database. It is not a contract for muzika platform
-                invalid_payment(payment)
+                invalid_payments.append({'payment_id': payment['payment_id']})
                 continue
 
-            """
-            Contract is valid for our platform. Use it!
-            """
+            # the indexer confirms the events of the payments submitted before it scanned the block. If submitted
+            # after that, confirm it here by the event in the confirmed block.
+            purchase_events[payment['tx_hash'].lower()] = parse_purchase_event(events[-1])
 
-            # price is equal to event.data (type is str)
-            price = event.data
+        # update all payments at once
+        with connection.begin():
+            if failed_payments:
+                connection.execute(text(failed_query_statement), *failed_payments)
+            if invalid_payments:
+                connection.execute(text(invalid_query_statement), *invalid_payments)
 
-            # buyer is equal to event.topics[1]
-            # structure of event is `Purchase(address,uint256)`
-            # type is HexBytes
-            buyer = web3.toChecksumAddress('0x' + event.topics[1].hex()[-40:])
-
-            db.Statement(db.table.MUSIC_PAYMENTS)\
-                .set(buyer_address=buyer,
-                     contract_address=contract_address,
-                     price=price,
-                     status='success')\
-                .where(payment_id=payment['payment_id'])\
-                .update(connection)
+            # if the contract does not exist in our database, it is not a contract for muzika platform,
+            # so the payment is invalid. If exists, the contract is valid for our platform.
+            confirm_payments(connection, purchase_events)
 
         # execute update query
         connection.execute(text(update_query_statement))
 
         # execute delete query (timeout is doubled)
         connection.execute(text(delete_query_statement))
+
+    return len(payments)